@@ -0,0 +1,245 @@
+"""Пакетная регистрация пользователей."""
+
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .constants import BULK_REGISTRATION_BATCH_SIZE
+from .serializers import UserRegistrationSerializer
+from referral_system import outbox, tree
+from referral_system.analytics import record_referrals
+from referral_system.codes import redeem
+from referral_system.models import ReferralCode, ReferralRelationship
+from users.hashing import hash_passwords
+
+
+User = get_user_model()
+
+
+class BulkUserRowSerializer(UserRegistrationSerializer):
+    """Проверка полей строки без запросов к БД.
+
+    Уникальность username/email и реферальные коды проверяются для всей
+    пачки сразу.
+    """
+
+    class Meta(UserRegistrationSerializer.Meta):
+        extra_kwargs = {
+            'username': {'validators': [UnicodeUsernameValidator()]},
+            'email': {'validators': []},
+        }
+
+    def validate_email(self, value):
+        return value
+
+    def validate(self, data):
+        return data
+
+
+class ReferralCodeUnavailable(Exception):
+    """Код пачки удален, заменен или исчерпан после проверки."""
+
+
+def error(row, errors):
+    return {'row': row, 'status': 'error', 'errors': errors}
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def validate_batch(batch):
+    """Проверяет пачку строк, возвращает (валидные строки, ошибки)."""
+    results = {}
+    valid = {}
+    for row, data in batch:
+        serializer = BulkUserRowSerializer(data=data)
+        if serializer.is_valid():
+            # Как при одиночной регистрации (UserRegistrationSerializer)
+            data = valid[row] = dict(serializer.validated_data)
+            data['username'] = User.normalize_username(data['username'])
+            data['email'] = User.objects.normalize_email(data['email'])
+        else:
+            results[row] = error(row, serializer.errors)
+
+    # Дубликаты внутри пачки и среди существующих пользователей
+    usernames = {data['username'] for data in valid.values()}
+    emails = {data['email'].lower() for data in valid.values()}
+    taken_usernames = set(
+        User.objects.filter(username__in=usernames)
+        .values_list('username', flat=True)
+    )
+    taken_emails = {
+        email.lower() for email in
+        User.objects.by_emails(emails).values_list('email', flat=True)
+    }
+    codes = {
+        data['referral_code'] for data in valid.values()
+        if data.get('referral_code')
+    }
+    referral_codes = {
+        code['code']: code for code in
+        ReferralCode.objects.filter(code__in=codes)
+        .values('id', 'code', 'user_id', 'expiration_date', 'max_uses',
+                'uses_count')
+    }
+    # Оставшиеся регистрации по кодам с лимитом
+    remaining = {
+        code: referral_code['max_uses'] - referral_code['uses_count']
+        for code, referral_code in referral_codes.items()
+        if referral_code['max_uses'] is not None
+    }
+
+    # Пути предков всех рефереров пачки - одним запросом
+    referrer_paths = tree.get_paths(
+        {code['user_id'] for code in referral_codes.values()}
+    )
+
+    now = timezone.now()
+    for row, data in list(valid.items()):
+        errors = {}
+        if data['username'] in taken_usernames:
+            errors['username'] = [
+                'Пользователь с таким именем уже существует.'
+            ]
+        if data['email'].lower() in taken_emails:
+            errors['email'] = ['Пользователь с таким email уже существует.']
+        code = data.get('referral_code')
+        if code:
+            if code not in referral_codes:
+                errors['referral_code'] = ['Реферальный код не найден.']
+            elif referral_codes[code]['expiration_date'] < now:
+                errors['referral_code'] = [
+                    'Срок действия реферального кода истек.'
+                ]
+            elif remaining.get(code, 1) <= 0:
+                errors['referral_code'] = [
+                    'Лимит регистраций по реферальному коду исчерпан.'
+                ]
+            else:
+                referrer_id = referral_codes[code]['user_id']
+                try:
+                    tree.check_depth(referrer_paths[referrer_id])
+                except tree.ReferralDepthError as exc:
+                    errors['referral_code'] = [str(exc)]
+                data['referral_code_id'] = referral_codes[code]['id']
+                data['referrer_id'] = referrer_id
+                data['referrer_path'] = referrer_paths[referrer_id]
+        if errors:
+            results[row] = error(row, errors)
+            del valid[row]
+        else:
+            taken_usernames.add(data['username'])
+            taken_emails.add(data['email'].lower())
+            if code in remaining:
+                remaining[code] -= 1
+    return valid, results
+
+
+def build_user(data, password):
+    return User(
+        username=data['username'],
+        email=data['email'],
+        password=password,
+    )
+
+
+def hash_batch(valid):
+    """Хеши паролей пачки ``{строка: хеш}``.
+
+    Считаются один раз и для пакетной, и для построчной вставки.
+    """
+    return dict(zip(
+        valid, hash_passwords(data['password'] for data in valid.values())
+    ))
+
+
+def insert_batch(valid, passwords):
+    """Вставляет пользователей, связи и события outbox одной транзакцией."""
+    rows = list(valid)
+    users = [build_user(valid[row], passwords[row]) for row in rows]
+    with transaction.atomic():
+        # Регистрации по кодам учитываются до вставки: код мог быть
+        # удален, заменен или исчерпан после проверки пачки
+        redemptions = Counter(
+            (valid[row]['referral_code_id'], valid[row]['referral_code'])
+            for row in rows if 'referrer_id' in valid[row]
+        )
+        for (referral_code_id, code), count in redemptions.items():
+            if not redeem(referral_code_id, code, count):
+                raise ReferralCodeUnavailable(code)
+        User.objects.bulk_create(users)
+        if any(user.pk is None for user in users):
+            ids = dict(
+                User.objects.filter(
+                    username__in=[user.username for user in users]
+                ).values_list('username', 'id')
+            )
+            for user in users:
+                user.pk = ids[user.username]
+        relationships = ReferralRelationship.objects.bulk_create([
+            tree.build_relationship(
+                valid[row]['referrer_id'], user.pk,
+                referrer_path=valid[row]['referrer_path']
+            )
+            for row, user in zip(rows, users)
+            if 'referrer_id' in valid[row]
+        ])
+        # bulk_create не отправляет сигналы: счетчики обновляем явно
+        record_referrals(
+            (relationship.referrer_id, relationship.referral_id)
+            for relationship in relationships
+        )
+        outbox.publish_many(outbox.USER_REGISTERED, [
+            {
+                'user_id': user.pk, 'email': user.email,
+                'referrer_id': valid[row].get('referrer_id'),
+            }
+            for row, user in zip(rows, users)
+        ])
+    return {
+        row: {'row': row, 'status': 'created', 'id': user.pk}
+        for row, user in zip(rows, users)
+    }
+
+
+def insert_rows_one_by_one(valid, passwords):
+    """Запасной путь при конфликте с параллельной регистрацией."""
+    results = {}
+    for row, data in valid.items():
+        try:
+            results.update(insert_batch({row: data}, passwords))
+        except IntegrityError:
+            results[row] = error(
+                row, {'non_field_errors': ['Пользователь уже существует.']}
+            )
+        except ReferralCodeUnavailable:
+            results[row] = error(row, {'referral_code': [
+                'Реферальный код удален, истек или исчерпан.'
+            ]})
+    return results
+
+
+def register_users(rows, batch_size=BULK_REGISTRATION_BATCH_SIZE):
+    """Регистрирует пользователей пачками, возвращает отчет по строкам.
+
+    Каждая пачка проверяется целиком (по одному запросу на username,
+    email и реферальные коды), пароли хешируются в пуле процессов,
+    а запись выполняется через bulk_create в отдельной транзакции.
+    """
+    for batch in chunked(enumerate(rows), batch_size):
+        valid, results = validate_batch(batch)
+        if valid:
+            passwords = hash_batch(valid)
+            try:
+                results.update(insert_batch(valid, passwords))
+            except (IntegrityError, ReferralCodeUnavailable):
+                results.update(insert_rows_one_by_one(valid, passwords))
+        for row, _ in batch:
+            yield results[row]
@@ -0,0 +1,204 @@
+"""Кэш реферальных кодов по email реферера (read-through)."""
+
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from backend.metrics import record_cache
+
+from .constants import (
+    REFERRAL_CODE_CACHE_KEY, TIME_TO_CACHE, TIME_TO_NEGATIVE_CACHE
+)
+from .renderers import dumps
+from .serializers import PublicReferralCodeSerializer
+
+
+User = get_user_model()
+
+# Негативные записи: пользователя нет / у пользователя нет кода
+NO_USER = {}
+NO_CODE = {'code': None}
+
+
+def get_cache_key(email):
+    return REFERRAL_CODE_CACHE_KEY.format(email=email.lower())
+
+
+# Формат даты как в PublicReferralCodeSerializer
+_expiration_date_field = (
+    PublicReferralCodeSerializer().fields['expiration_date']
+)
+
+
+def build_payload(code, expiration_date):
+    """Запись кэша для кода: код, срок действия и ``body``.
+
+    ``body`` - готовое тело ответа с кодом, чтобы при попадании в кэш
+    не рендерить JSON заново.
+    """
+    data = {
+        'code': code,
+        'expiration_date': _expiration_date_field.to_representation(
+            expiration_date
+        ),
+    }
+    return {**data, 'body': dumps(data)}
+
+
+def get_code_data(payload):
+    """Поля кода из записи кэша (без ``body``)."""
+    return {
+        'code': payload['code'],
+        'expiration_date': payload['expiration_date'],
+    }
+
+
+def get_body(payload):
+    """Тело ответа с кодом (записи, созданные до ``body``, - рендеринг)."""
+    body = payload.get('body')
+    return dumps(get_code_data(payload)) if body is None else body
+
+
+def is_payload_expired(payload):
+    return parse_datetime(payload['expiration_date']) < timezone.now()
+
+
+def get_timeout(payload):
+    """TTL записи: не позже окончания срока действия кода."""
+    if not payload.get('code'):
+        return TIME_TO_NEGATIVE_CACHE
+    expiration_date = parse_datetime(payload['expiration_date'])
+    seconds_left = int((expiration_date - timezone.now()).total_seconds())
+    return max(0, min(TIME_TO_CACHE, seconds_left))
+
+
+def set_referral_code(email, payload):
+    timeout = get_timeout(payload)
+    if timeout:
+        cache.set(get_cache_key(email), payload, timeout=timeout)
+    else:
+        cache.delete(get_cache_key(email))
+
+
+async def aset_referral_code(email, payload):
+    timeout = get_timeout(payload)
+    if timeout:
+        await cache.aset(get_cache_key(email), payload, timeout=timeout)
+    else:
+        await cache.adelete(get_cache_key(email))
+
+
+def invalidate_referral_code(email):
+    cache.delete(get_cache_key(email))
+
+
+def referral_code_query(email):
+    return (
+        User.objects
+        .by_email(email)
+        .values('referral_code__code', 'referral_code__expiration_date')
+    )
+
+
+def referral_codes_query(emails):
+    return (
+        User.objects
+        .by_emails(emails)
+        .values(
+            'email', 'referral_code__code', 'referral_code__expiration_date'
+        )
+    )
+
+
+def row_to_payload(row):
+    if row is None:
+        return NO_USER
+    if row['referral_code__expiration_date'] is None:
+        return NO_CODE
+    # У истекшего кода после очистки (``expiry``) code пустой
+    return build_payload(
+        row['referral_code__code'], row['referral_code__expiration_date']
+    )
+
+
+def load_referral_code(email):
+    """Загружает код реферера из БД одним запросом."""
+    return row_to_payload(referral_code_query(email).first())
+
+
+async def aload_referral_code(email):
+    return row_to_payload(await referral_code_query(email).afirst())
+
+
+def get_referral_code(email):
+    """Возвращает payload кода из кэша, при промахе - из БД."""
+    payload = cache.get(get_cache_key(email))
+    record_cache('referral_code', payload is not None)
+    if payload is None:
+        payload = load_referral_code(email)
+        set_referral_code(email, payload)
+    return payload
+
+
+async def aget_referral_code(email):
+    """Асинхронный вариант get_referral_code."""
+    payload = await cache.aget(get_cache_key(email))
+    record_cache('referral_code', payload is not None)
+    if payload is None:
+        payload = await aload_referral_code(email)
+        await aset_referral_code(email, payload)
+    return payload
+
+
+def load_referral_codes(emails):
+    """Коды для набора email одним запросом к БД: ``{email: payload}``."""
+    rows = {
+        row['email'].lower(): row for row in referral_codes_query(emails)
+    }
+    return {
+        email: row_to_payload(rows.get(email.lower())) for email in emails
+    }
+
+
+def set_referral_codes(payloads):
+    """Записывает ``{email: payload}``: один set_many на каждый TTL."""
+    groups = defaultdict(dict)
+    for email, payload in payloads.items():
+        groups[get_timeout(payload)][get_cache_key(email)] = payload
+    expired = groups.pop(0, None)
+    if expired:
+        cache.delete_many(expired)
+    for timeout, data in groups.items():
+        cache.set_many(data, timeout=timeout)
+
+
+def get_referral_codes(emails):
+    """Payload кодов для набора email: ``{email: payload}``.
+
+    Один get_many к кэшу, промахи - одним запросом к БД и записью
+    в кэш (в Redis - mget и конвейер вместо запроса на каждый email).
+    Email, отличающиеся регистром, получают один и тот же payload.
+    """
+    emails = list(emails)
+    keys = defaultdict(list)
+    for email in emails:
+        keys[get_cache_key(email)].append(email)
+    found = cache.get_many(keys)
+    payloads = {}
+    missing = []
+    for key, key_emails in keys.items():
+        payload = found.get(key)
+        record_cache('referral_code', payload is not None)
+        if payload is None:
+            missing.append(key_emails[0])
+        else:
+            payloads[key] = payload
+    if missing:
+        loaded = load_referral_codes(missing)
+        set_referral_codes(loaded)
+        for email, payload in loaded.items():
+            payloads[get_cache_key(email)] = payload
+    return {email: payloads[get_cache_key(email)] for email in emails}
@@ -0,0 +1,33 @@
+"""ETag и ответ 304 для представлений API.
+
+Last-Modified не отдается: у него секундная точность, и изменение в ту
+же секунду, что и прошлый ответ, дало бы клиенту устаревший 304.
+"""
+
+import hashlib
+
+from django.utils.cache import get_conditional_response
+
+
+def get_version_etag(version):
+    # Слабый ETag: представления (JSON, форматированный JSON) равнозначны
+    return f'W/"{version}"'
+
+
+def get_body_etag(body):
+    return '"{}"'.format(
+        hashlib.md5(body, usedforsecurity=False).hexdigest()
+    )
+
+
+def set_validators(response, etag):
+    response.headers['ETag'] = etag
+    return response
+
+
+def get_not_modified(request, etag):
+    """Ответ 304 с ETag, если версия у клиента актуальна."""
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        return None
+    return set_validators(response, etag)
@@ -1,2 +1,11 @@
-TIME_TO_CODE = 7  # 7 дней для реферального кода
+TIME_TO_CODE = 7  # 7 дней для реферального кода
 TIME_TO_CACHE = 60 * 60 * 24  # 1 день для кэша
+TIME_TO_NEGATIVE_CACHE = 60  # 1 минута для кэша отсутствующего кода
+REFERRAL_CODE_CACHE_KEY = 'referral_code_{email}'
+REFERRALS_PAGE_SIZE = 100  # Рефералов на странице по умолчанию
+MAX_REFERRALS_PAGE_SIZE = 1000
+BULK_REGISTRATION_BATCH_SIZE = 1000  # Пользователей в одной транзакции
+BULK_REGISTRATION_MAX_ROWS = 10000  # Максимум строк в одном запросе
+LEADERBOARD_SIZE = 10  # Рефереров в рейтинге по умолчанию
+MAX_LEADERBOARD_SIZE = 100
+REFERRAL_CODES_LOOKUP_MAX_EMAILS = 1000  # Максимум email в одном запросе
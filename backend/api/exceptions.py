@@ -0,0 +1,22 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.views import exception_handler as drf_exception_handler
+
+from users.hashing import HashingPoolSaturated
+
+
+class ServiceUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервис временно перегружен, повторите запрос позже.'
+    default_code = 'service_unavailable'
+
+    def __init__(self, detail=None, code=None, wait=None):
+        super().__init__(detail, code)
+        self.wait = wait
+
+
+def exception_handler(exc, context):
+    """Обработчик DRF, переводящий перегрузку пула хеширования в 503."""
+    if isinstance(exc, HashingPoolSaturated):
+        exc = ServiceUnavailable(wait=exc.retry_after)
+    return drf_exception_handler(exc, context)
@@ -0,0 +1,19 @@
+"""Обработчики событий outbox (``referral_system.outbox``) для кэша."""
+
+from .cache import load_referral_codes, set_referral_codes
+from referral_system import outbox
+
+
+@outbox.handler(
+    outbox.USER_REGISTERED, outbox.REFERRAL_CODE_CREATED,
+    outbox.REFERRAL_CODE_DELETED
+)
+def refresh_referral_codes(events):
+    """Перезаписывает в кэше коды пользователей из событий.
+
+    Запись строится по текущему состоянию БД, а не по данным события,
+    поэтому повтор или обработка не по порядку не вернет в кэш
+    удаленный код. Регистрация заменяет негативную запись ``NO_USER``.
+    """
+    emails = {event.payload['email'] for event in events}
+    set_referral_codes(load_referral_codes(emails))
@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bulk_registration import register_users
+from api.constants import BULK_REGISTRATION_BATCH_SIZE
+
+
+def read_rows(file):
+    """Читает JSON-массив целиком или NDJSON построчно."""
+    first = file.read(1)
+    while first.isspace():
+        first = file.read(1)
+    if first == '[':
+        yield from json.loads(first + file.read())
+        return
+    yield json.loads(first + file.readline())
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = (
+        'Регистрирует пользователей из файла (JSON-массив или NDJSON), '
+        'выводит отчет по строкам в формате NDJSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--batch-size', type=int, default=BULK_REGISTRATION_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        created = failed = 0
+        try:
+            with open(options['path'], encoding='utf-8') as file:
+                results = register_users(
+                    read_rows(file), batch_size=options['batch_size']
+                )
+                for result in results:
+                    if result['status'] == 'created':
+                        created += 1
+                    else:
+                        failed += 1
+                    self.stdout.write(json.dumps(result, ensure_ascii=False))
+        except (OSError, ValueError) as exc:
+            raise CommandError(exc)
+        self.stderr.write(f'Создано: {created}, с ошибками: {failed}.')
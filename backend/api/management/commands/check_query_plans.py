@@ -0,0 +1,106 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from api.cache import referral_code_query
+from api.constants import LEADERBOARD_SIZE, REFERRALS_PAGE_SIZE
+from referral_system.constants import (
+    EXPIRED_CODES_BATCH_SIZE, EXPORT_MAX_DEPTH, REFERRAL_EVENTS_BATCH_SIZE
+)
+from referral_system.analytics import get_leaderboard
+from referral_system.export import get_tree_queryset
+from referral_system.outbox import get_pending_events
+from referral_system.models import (
+    ReferralCode, ReferralRelationship, ReferrerStats
+)
+
+
+User = get_user_model()
+
+# Признаки плана без подходящего индекса
+SQLITE_PROBLEMS = (
+    re.compile(r'^SCAN (?!CONSTANT ROW)(?!.*USING)'),
+    re.compile(r'USE TEMP B-TREE'),
+)
+POSTGRESQL_PROBLEMS = (
+    re.compile(r'Seq Scan on'),
+    re.compile(r'^\s*(->\s*)?Sort\b'),
+)
+
+
+def get_hot_queries():
+    """SQL и параметры запросов, которые выполняют эндпоинты API."""
+    queries = {
+        'login': User.objects.select_related('referral_code')
+        .filter(username='username'),
+        'referral_code_by_email': referral_code_query('User@Example.com'),
+        'referral_code_by_user': ReferralCode.objects.filter(user_id=1),
+        'referral_code_by_code': ReferralCode.objects.filter(code='code'),
+        'active_codes': ReferralCode.objects.filter(
+            expiration_date__gt=timezone.now()
+        ),
+        'expired_codes': ReferralCode.objects
+        .filter(expiration_date__lte=timezone.now())
+        .order_by('expiration_date')
+        .values_list('id', 'user__email')[:EXPIRED_CODES_BATCH_SIZE],
+        'referrals_page': ReferralRelationship.objects
+        .filter(referrer_id=1, id__gt=1)
+        .select_related('referral')
+        .only('id', 'referral__username', 'referral__email')
+        .order_by('id')[:REFERRALS_PAGE_SIZE + 1],
+        'referrals_by_created': ReferralRelationship.objects
+        .filter(referrer_id=1).order_by('created_at'),
+        'referrer_stats': ReferrerStats.objects.filter(referrer_id=1),
+        'leaderboard': get_leaderboard(LEADERBOARD_SIZE),
+        'referral_upline': ReferralRelationship.objects
+        .filter(referral_id=1).values_list('path', flat=True)[:1],
+        'referral_tree': get_tree_queryset(1, EXPORT_MAX_DEPTH),
+        'outbox_events': get_pending_events(timezone.now())
+        .values_list('id', flat=True)[:REFERRAL_EVENTS_BATCH_SIZE],
+    }
+    for name, queryset in queries.items():
+        yield (name, *queryset.query.sql_with_params())
+
+
+def explain(cursor, sql, params):
+    if connection.vendor == 'sqlite':
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()], SQLITE_PROBLEMS
+    cursor.execute('EXPLAIN ' + sql, params)
+    return [row[0] for row in cursor.fetchall()], POSTGRESQL_PROBLEMS
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет планы запросов API (EXPLAIN): каждый запрос должен '
+        'использовать индекс, без полного сканирования и сортировки.'
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(
+                f'СУБД {connection.vendor} не поддерживается.'
+            )
+        failed = []
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # На маленьких таблицах планировщик предпочитает Seq Scan
+                cursor.execute('SET enable_seqscan = off')
+            for name, sql, params in get_hot_queries():
+                plan, problems = explain(cursor, sql, params)
+                bad = [
+                    line for line in plan
+                    if any(problem.search(line) for problem in problems)
+                ]
+                self.stdout.write(f'{name}: {"FAIL" if bad else "OK"}')
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+                if bad:
+                    failed.append(name)
+        if failed:
+            raise CommandError(
+                'Запросы без индекса: ' + ', '.join(failed) + '.'
+            )
@@ -0,0 +1,46 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.cache import get_cache_key
+from referral_system.constants import (
+    EXPIRED_CODES_BATCH_SIZE, EXPIRED_CODES_SWEEP_INTERVAL
+)
+from referral_system.expiry import sweep_expired_codes
+
+
+class Command(BaseCommand):
+    help = (
+        'Освобождает истекшие реферальные коды пачками и вытесняет их из '
+        'кэша. С --loop работает постоянно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=EXPIRED_CODES_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Повторять очистку каждые --interval секунд.'
+        )
+        parser.add_argument(
+            '--interval', type=int, default=EXPIRED_CODES_SWEEP_INTERVAL
+        )
+
+    def sweep(self, batch_size):
+        swept = 0
+        for count, emails in sweep_expired_codes(batch_size=batch_size):
+            cache.delete_many([get_cache_key(email) for email in emails])
+            swept += count
+        return swept
+
+    def handle(self, *args, **options):
+        while True:
+            swept = self.sweep(options['batch_size'])
+            self.stdout.write(f'Освобождено истекших кодов: {swept}.')
+            if not options['loop']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
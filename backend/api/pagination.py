@@ -0,0 +1,90 @@
+import base64
+import binascii
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .constants import MAX_REFERRALS_PAGE_SIZE, REFERRALS_PAGE_SIZE
+
+
+class KeysetPagination(BasePagination):
+    """Keyset-пагинация по возрастанию id.
+
+    Курсор хранит id последней записи страницы, поэтому следующая
+    страница выбирается условием ``id > cursor`` без OFFSET.
+    """
+
+    page_size = REFERRALS_PAGE_SIZE
+    max_page_size = MAX_REFERRALS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            return int(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, last_id):
+        return base64.urlsafe_b64encode(str(last_id).encode()).decode()
+
+    def get_page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is not None:
+            queryset = queryset.filter(id__gt=self.cursor)
+        # Лишняя запись показывает, есть ли следующая страница
+        return queryset.order_by('id')[:self.page_size + 1]
+
+    @staticmethod
+    def get_id(obj):
+        # Страница моделей или строк values()
+        return obj['id'] if isinstance(obj, dict) else obj.id
+
+    def set_page(self, page):
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.next_id = self.get_id(page[-1]) if self.has_next else None
+        return page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request)
+        return self.set_page([
+            obj async for obj in page_queryset.aiterator(
+                chunk_size=self.page_size + 1
+            )
+        ])
+
+    def get_next_link(self):
+        if self.next_id is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_id)
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
@@ -0,0 +1,49 @@
+"""JSON-рендерер на orjson с откатом на стандартный json.
+
+orjson сериализует в 5-10 раз быстрее ``json.dumps`` с кодировщиком
+DRF и сразу возвращает bytes. Без установленного orjson, а также для
+форматированного вывода (``indent``) и ``ensure_ascii`` рендерер
+работает как ``JSONRenderer``.
+"""
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Типы, которых нет в orjson (Decimal, ленивые строки и т.д.)
+_default = JSONEncoder().default
+
+
+def dumps(data):
+    """JSON в bytes в компактном формате ответов API."""
+    if orjson is None:
+        return FastJSONRenderer().render(data)
+    content = orjson.dumps(
+        data, default=_default, option=orjson.OPT_NON_STR_KEYS
+    )
+    # Как JSONRenderer: вывод - строгое подмножество JavaScript
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029'
+        )
+    return content
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii
+                or not self.compact):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        return dumps(data)
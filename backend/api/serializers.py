@@ -1,8 +1,16 @@
 from django.contrib.auth import get_user_model
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
 
-from referral_system.models import ReferralCode, ReferralRelationship
+from .constants import REFERRAL_CODES_LOOKUP_MAX_EMAILS
+from referral_system import codes, outbox, tree
+from referral_system.models import (
+    ReferralCode, ReferralRelationship, ReferrerStats
+)
+from users import hashing
 
 
 User = get_user_model()
@@ -20,24 +28,98 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         model = User
         fields = ('username', 'email', 'password', 'referral_code')
 
-    def create(self, validated_data):
-        referral_code = validated_data.pop('referral_code', None)
-        user = User.objects.create_user(**validated_data)
-
-        if referral_code:
-            referral_code_obj = get_object_or_404(
-                ReferralCode, code=referral_code
+    def validate_email(self, value):
+        # Email уникален без учета регистра (индекс по LOWER(email))
+        if User.objects.by_email(value).exists():
+            raise serializers.ValidationError(
+                'Пользователь с таким email уже существует.'
             )
+        return value
 
-            if referral_code_obj.is_expired():
-                raise serializers.ValidationError(
-                    {'referral_code': 'Срок действия реферального кода истек.'}
-                )
+    def validate(self, data):
+        """Проверяет реферальный код до хеширования пароля и записи.
+
+        Код, его владелец и путь предков владельца читаются одним
+        запросом по уникальным индексам.
+        """
+        code = data.get('referral_code')
+        if not code:
+            return data
+        referral_code = (
+            ReferralCode.objects.filter(code=code)
+            .values(
+                'id', 'user_id', 'expiration_date', 'max_uses', 'uses_count',
+                referrer_path=F('user__referrer__path')
+            )
+            .first()
+        )
+        if referral_code is None:
+            raise serializers.ValidationError(
+                {'referral_code': 'Реферальный код не найден.'}
+            )
+        if referral_code['expiration_date'] < timezone.now():
+            raise serializers.ValidationError(
+                {'referral_code': 'Срок действия реферального кода истек.'}
+            )
+        if (referral_code['max_uses'] is not None
+                and referral_code['uses_count'] >= referral_code['max_uses']):
+            raise serializers.ValidationError({
+                'referral_code':
+                    'Лимит регистраций по реферальному коду исчерпан.'
+            })
+        # Путь корня дерева - его собственный id
+        referrer_path = (
+            referral_code['referrer_path']
+            or tree.encode(referral_code['user_id'])
+        )
+        try:
+            tree.check_depth(referrer_path)
+        except tree.ReferralDepthError as exc:
+            raise serializers.ValidationError({'referral_code': str(exc)})
+        data['referral_code_id'] = referral_code['id']
+        data['referrer_id'] = referral_code['user_id']
+        data['referrer_path'] = referrer_path
+        return data
 
-            ReferralRelationship.objects.create(
-                referrer=referral_code_obj.user,
-                referral=user
+    def create(self, validated_data):
+        referral_code = validated_data.pop('referral_code', None)
+        # Хешируем пароль в пуле процессов, а не в потоке запроса
+        password = hashing.make_password(validated_data['password'])
+
+        # Пользователь, связь с реферером, счетчики реферера и событие
+        # outbox - атомарно
+        with transaction.atomic():
+            referrer_id = None
+            if referral_code:
+                # Код мог быть удален, заменен или исчерпан после
+                # проверки: условный UPDATE счетчика заново проверяет его
+                # и блокирует строку кода до конца транзакции
+                if not codes.redeem(
+                    validated_data['referral_code_id'], referral_code
+                ):
+                    raise serializers.ValidationError({
+                        'referral_code':
+                            'Реферальный код удален, истек или исчерпан.'
+                    })
+                referrer_id = validated_data['referrer_id']
+
+            user = User.objects.create(
+                username=User.normalize_username(validated_data['username']),
+                email=User.objects.normalize_email(validated_data['email']),
+                password=password
             )
+            if referrer_id is not None:
+                # Новый пользователь не может быть предком реферера,
+                # путь реферера уже проверен в validate()
+                tree.build_relationship(
+                    referrer_id, user.pk,
+                    referrer_path=validated_data['referrer_path']
+                ).save(force_insert=True)
+
+            outbox.publish(outbox.USER_REGISTERED, {
+                'user_id': user.pk, 'email': user.email,
+                'referrer_id': referrer_id,
+            })
 
         return user
 
@@ -52,37 +134,76 @@ class LoginSerializer(serializers.Serializer):
         fields = ('username', 'password')
 
     def validate(self, data):
+        """Проверяет учетные данные: один запрос к БД и одно хеширование."""
         username = data.get('username')
         password = data.get('password')
-        if username and password:
-            user = User.objects.get(username=username)
-            if user and user.check_password(password):
-                data['user'] = user
-                return data
-            else:
-                raise serializers.ValidationError(
-                    'Неверные имя пользователя или пароль.'
-                )
-        else:
+        if not (username and password):
             raise serializers.ValidationError(
                 'Необходимо ввести имя пользователя и пароль.'
             )
 
+        # Код загружается тем же запросом для claims токена
+        user = (
+            User.objects.select_related('referral_code')
+            .filter(username=username).first()
+        )
+        if user is None:
+            hashing.check_dummy_password(password)
+        elif (hashing.check_password(user, password)
+              and user.is_active):
+            data['user'] = user
+            return data
+        raise AuthenticationFailed('Неверные имя пользователя или пароль.')
+
 
 class ReferralCodeSerializer(serializers.ModelSerializer):
     """Сериализатор для реферального кода."""
 
     class Meta:
         model = ReferralCode
+        fields = ('code', 'expiration_date', 'max_uses', 'uses_count')
+
+
+class PublicReferralCodeSerializer(ReferralCodeSerializer):
+    """Код для поиска по email: без лимита и числа регистраций."""
+
+    class Meta(ReferralCodeSerializer.Meta):
         fields = ('code', 'expiration_date')
 
 
+class ReferralCodeCreateSerializer(serializers.Serializer):
+    """Параметры создания реферального кода."""
+
+    max_uses = serializers.IntegerField(
+        min_value=1, required=False, allow_null=True
+    )
+
+
 class EmailSerializer(serializers.Serializer):
     """Сериализатор для получения реферального кода по email."""
 
     email = serializers.EmailField()
 
 
+class EmailsSerializer(serializers.Serializer):
+    """Сериализатор для получения реферальных кодов по списку email."""
+
+    emails = serializers.ListField(
+        child=serializers.EmailField(), allow_empty=False,
+        max_length=REFERRAL_CODES_LOOKUP_MAX_EMAILS
+    )
+
+
+# Ответы списков строятся из values() без моделей и сериализаторов:
+# ключи и значения совпадают с ReferralSerializer/ReferrerStatsSerializer
+REFERRAL_VALUES = {
+    'referral_username': F('referral__username'),
+    'referral_email': F('referral__email'),
+}
+REFERRER_STATS_FIELDS = ('referrer', 'referrals_count', 'converted_count')
+REFERRER_STATS_VALUES = {'username': F('referrer__username')}
+
+
 class ReferralSerializer(serializers.ModelSerializer):
     referral_username = serializers.CharField(
         source='referral.username', read_only=True
@@ -94,3 +215,13 @@ class ReferralSerializer(serializers.ModelSerializer):
     class Meta:
         model = ReferralRelationship
         fields = ('referral_username', 'referral_email')
+
+
+class ReferrerStatsSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(
+        source='referrer.username', read_only=True
+    )
+
+    class Meta:
+        model = ReferrerStats
+        fields = ('referrer', 'username', 'referrals_count', 'converted_count')
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.cache import NO_USER, get_referral_codes
+
+
+User = get_user_model()
+
+
+class GetReferralCodesTests(TestCase):
+    """Поиск кодов по списку email."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_emails_differing_by_case(self):
+        User.objects.create_user('a', 'a@example.com', 'password')
+        emails = [
+            'a@example.com', 'A@example.com', 'zz@example.com',
+            'c@example.com'
+        ]
+        for _ in range(2):  # промах и попадание в кэш
+            payloads = get_referral_codes(emails)
+            self.assertEqual(list(payloads), emails)
+            self.assertEqual(
+                payloads['a@example.com'], payloads['A@example.com']
+            )
+            self.assertNotEqual(payloads['a@example.com'], NO_USER)
+            self.assertEqual(payloads['zz@example.com'], NO_USER)
+
+    def test_view_returns_every_email(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        client = APIClient()
+        client.force_authenticate(admin)
+        emails = ['admin@example.com', 'ADMIN@example.com', 'x@example.com']
+        response = client.post(
+            '/api/referral_code/get_by_emails/', {'emails': emails},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()), emails)
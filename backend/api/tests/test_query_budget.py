@@ -0,0 +1,104 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.views import RegisterView
+from backend.metrics import QueryBudgetExceeded
+from backend.ratelimit import RateLimiter
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class QueryBudgetTests(TransactionTestCase):
+    """Представления укладываются в свои ``query_budget``.
+
+    Транзакции фиксируются по-настоящему: учитываются и действия после
+    фиксации (обработка событий outbox в запросе).
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Свежие счетчики лимитов: тесты не должны упираться в 429
+        limiter = mock.patch('backend.ratelimit._limiter', RateLimiter())
+        limiter.start()
+        self.addCleanup(limiter.stop)
+        self.client = APIClient()
+        self.register('referrer')
+        self.token = self.login('referrer')
+        self.auth = APIClient()
+        self.auth.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        response = self.auth.post('/api/referral_code/')
+        self.assertEqual(response.status_code, 201)
+        self.code = response.json()['code']
+
+    def register(self, username, **data):
+        response = self.client.post('/api/register/', {
+            'username': username, 'email': f'{username}@example.com',
+            'password': 'password123', **data,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response
+
+    def login(self, username):
+        response = self.client.post('/api/login/', {
+            'username': username, 'password': 'password123',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['access']
+
+    def get_user_id(self):
+        return get_user_model().objects.get(username='referrer').pk
+
+    def test_register_with_referral_code(self):
+        self.register('referral', referral_code=self.code)
+
+    def test_referral_code(self):
+        self.assertEqual(self.auth.get('/api/referral_code/').status_code, 200)
+        self.assertEqual(
+            self.auth.delete('/api/referral_code/').status_code, 204
+        )
+
+    def test_referral_code_by_email(self):
+        for _ in range(2):  # промах и попадание в кэш
+            response = self.client.get(
+                '/api/referral_code/get_by_email/',
+                {'email': 'referrer@example.com'}
+            )
+            self.assertEqual(response.status_code, 200)
+        response = self.client.post(
+            '/api/referral_code/get_by_email/',
+            {'email': 'nobody@example.com'}, format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_referral_codes_by_emails(self):
+        get_user_model().objects.filter(username='referrer').update(
+            is_staff=True
+        )
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.login("referrer")}'
+        )
+        response = client.post('/api/referral_code/get_by_emails/', {
+            'emails': ['referrer@example.com', 'nobody@example.com'],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_referrals_and_stats(self):
+        for index in range(3):
+            self.register(f'referral{index}', referral_code=self.code)
+        user_id = self.get_user_id()
+        for path in (
+            f'/api/referrals/{user_id}/', f'/api/referrals/{user_id}/stats/',
+            '/api/referrals/leaderboard/',
+        ):
+            with self.subTest(path=path):
+                self.assertEqual(self.auth.get(path).status_code, 200)
+
+    def test_budget_exceeded_raises(self):
+        with mock.patch.object(RegisterView, 'query_budget', 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.register('other')
@@ -0,0 +1,14 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class CheckQueryPlansTests(TestCase):
+    """Горячие запросы API используют индексы тестовой БД после миграций."""
+
+    def test_query_plans(self):
+        # При плане без индекса команда бросает CommandError
+        stdout = StringIO()
+        call_command('check_query_plans', stdout=stdout)
+        self.assertNotIn('FAIL', stdout.getvalue())
@@ -0,0 +1,25 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from backend.db.routers import (
+    PRIMARY_PIN_COOKIE, PrimaryPinMiddleware, PrimaryReplicaRouter
+)
+
+
+class PrimaryPinMiddlewareTests(SimpleTestCase):
+    """Cookie закрепления за основной БД ставится только при репликах."""
+
+    def write_request(self):
+        middleware = PrimaryPinMiddleware(lambda request: HttpResponse())
+        request = RequestFactory().post('/')
+        middleware.process_request(request)
+        PrimaryReplicaRouter().db_for_write(None)
+        return middleware.process_response(request, HttpResponse())
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_cookie_without_replicas(self):
+        self.assertNotIn(PRIMARY_PIN_COOKIE, self.write_request().cookies)
+
+    @override_settings(DATABASE_REPLICAS=['replica_0'])
+    def test_cookie_after_write(self):
+        self.assertIn(PRIMARY_PIN_COOKIE, self.write_request().cookies)
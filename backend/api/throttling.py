@@ -0,0 +1,139 @@
+"""Троттлинг API: лимиты по IP, пользователю и целевому аккаунту.
+
+Проверка выполняется в ``APIView.initial`` до обработчика, то есть до
+запросов к БД и хеширования пароля. Лимиты задаются в
+``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']`` (``None`` отключает
+лимит), счетчики считает ``backend.ratelimit``.
+"""
+
+import hashlib
+
+from rest_framework.throttling import SimpleRateThrottle
+
+from backend.ratelimit import get_limiter
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """SimpleRateThrottle со счетчиком скользящего окна.
+
+    В отличие от SimpleRateThrottle не хранит в кэше историю запросов:
+    проверка и учет запроса - одна атомарная операция.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self._wait = get_limiter().hit(
+            self.key, self.num_requests, self.duration
+        )
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class AnonRateThrottle(SlidingWindowThrottle):
+    """Лимит анонимных запросов по IP."""
+
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return f'{self.scope}:{self.get_ident(request)}'
+
+
+class UserRateThrottle(SlidingWindowThrottle):
+    """Лимит по пользователю, для анонимных запросов - по IP."""
+
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'{self.scope}:user:{request.user.pk}'
+        return f'{self.scope}:ip:{self.get_ident(request)}'
+
+
+class ScopedIPRateThrottle(SlidingWindowThrottle):
+    """Лимит по IP для ``throttle_scope`` представления."""
+
+    scope_attr = 'throttle_scope'
+
+    def __init__(self):
+        # Лимит зависит от представления и читается в allow_request
+        pass
+
+    def allow_request(self, request, view):
+        if not self.set_scope(view):
+            return True
+        return super().allow_request(request, view)
+
+    def set_scope(self, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return False
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return True
+
+    def get_cache_key(self, request, view):
+        return f'{self.scope}:{self.get_ident(request)}'
+
+
+class TargetRateThrottle(ScopedIPRateThrottle):
+    """Лимит попыток по целевому аккаунту независимо от IP.
+
+    Поле запроса с аккаунтом (email, username; для GET - параметр
+    строки запроса) задает атрибут представления
+    ``throttle_target_field``. Так перебор паролей одного пользователя
+    или проверку email нельзя распределить по множеству адресов.
+    """
+
+    scope_attr = 'throttle_target_scope'
+
+    def get_cache_key(self, request, view):
+        data = (
+            request.query_params if request.method in ('GET', 'HEAD')
+            else request.data
+        )
+        target = (
+            data.get(view.throttle_target_field)
+            if hasattr(data, 'get') else None
+        )
+        if not isinstance(target, str) or not target:
+            # Запрос без поля отклонит валидация сериализатора
+            return None
+        digest = hashlib.sha256(
+            target.strip().lower().encode()
+        ).hexdigest()[:32]
+        return f'{self.scope}:{digest}'
+
+
+class FailedAttemptRateThrottle(TargetRateThrottle):
+    """Лимит неудачных попыток по целевому аккаунту.
+
+    Запрос только проверяет лимит, неудачную попытку учитывает
+    представление вызовом ``record_failure``: успешные входы владельца
+    аккаунта лимит не расходуют.
+    """
+
+    def allow_request(self, request, view):
+        if not self.set_scope(view) or self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self._wait = get_limiter().check(
+            self.key, self.num_requests, self.duration
+        )
+        return allowed
+
+    def record_failure(self, request, view):
+        if not self.set_scope(view) or self.rate is None:
+            return
+        key = self.get_cache_key(request, view)
+        if key is not None:
+            get_limiter().hit(key, self.num_requests, self.duration)
@@ -1,12 +1,15 @@
 from django.urls import path
 
 from .views import (
-    RegisterView, LoginView, ReferralCodeView,
-    GetReferralCodeByEmailView, ReferralsListView
+    RegisterView, BulkRegisterView, LoginView, ReferralCodeView,
+    GetReferralCodeByEmailView, GetReferralCodesByEmailsView,
+    ReferralsListView, ReferralsExportView,
+    ReferrerStatsView, LeaderboardView, CacheStatsView
 )
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
+    path('register/bulk/', BulkRegisterView.as_view(), name='register_bulk'),
     path('login/', LoginView.as_view(), name='login'),
     path('referral_code/', ReferralCodeView.as_view(), name='referral_code'),
     path(
@@ -14,9 +17,30 @@ urlpatterns = [
         GetReferralCodeByEmailView.as_view(),
         name='get_referral_code_by_email'
     ),
+    path(
+        'referral_code/get_by_emails/',
+        GetReferralCodesByEmailsView.as_view(),
+        name='get_referral_codes_by_emails'
+    ),
     path(
         'referrals/<int:pk>/',
         ReferralsListView.as_view(),
         name='referrals'
     ),
+    path(
+        'referrals/<int:pk>/export/',
+        ReferralsExportView.as_view(),
+        name='referrals_export'
+    ),
+    path(
+        'referrals/<int:pk>/stats/',
+        ReferrerStatsView.as_view(),
+        name='referrer_stats'
+    ),
+    path(
+        'referrals/leaderboard/',
+        LeaderboardView.as_view(),
+        name='referrals_leaderboard'
+    ),
+    path('cache_stats/', CacheStatsView.as_view(), name='cache_stats'),
 ]
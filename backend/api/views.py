@@ -1,34 +1,74 @@
-import asyncio
-import uuid
-
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.contrib.auth import authenticate, get_user_model
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework import status, permissions
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 
-from .constants import TIME_TO_CODE, TIME_TO_CACHE
+from .async_views import AsyncAPIView
+from .bulk_registration import register_users
+from .cache import (
+    NO_CODE, NO_USER, aget_referral_code, get_body, get_code_data,
+    get_referral_codes, get_timeout, invalidate_referral_code,
+    is_payload_expired
+)
+from .conditional import (
+    get_body_etag, get_not_modified, get_version_etag, set_validators
+)
+from .constants import (
+    BULK_REGISTRATION_MAX_ROWS, LEADERBOARD_SIZE, MAX_LEADERBOARD_SIZE,
+    TIME_TO_CODE
+)
+from .pagination import KeysetPagination
+from .parsers import NDJSONParser
 from .serializers import (
-    UserRegistrationSerializer, LoginSerializer,
-    ReferralCodeSerializer, EmailSerializer,
-    ReferralSerializer
+    UserRegistrationSerializer, LoginSerializer, ReferralCodeSerializer,
+    ReferralCodeCreateSerializer, PublicReferralCodeSerializer,
+    EmailSerializer, EmailsSerializer,
+    ReferralSerializer, ReferrerStatsSerializer, REFERRAL_VALUES,
+    REFERRER_STATS_FIELDS, REFERRER_STATS_VALUES
+)
+from .throttling import (
+    FailedAttemptRateThrottle, ScopedIPRateThrottle, TargetRateThrottle
+)
+from referral_system import outbox
+from referral_system.analytics import get_leaderboard
+from referral_system.codes import create_referral_code
+from referral_system.export import EXPORT_FORMATS, export_referral_tree
+from referral_system.models import (
+    ReferralCode, ReferralRelationship, ReferrerStats
 )
-from referral_system.constants import MAX_LENGTH_REFERRAL_CODE
-from referral_system.models import ReferralCode
+from referral_system.versions import aget_version
+from users.tokens import UserClaimsRefreshToken
 
 
 User = get_user_model()
 
+# Бюджеты запросов к БД (query_budget, см. backend.metrics) плюс
+# загрузка пользователя JWTAuthentication, если токены не stateless
+AUTH_QUERIES = 0 if settings.JWT_STATELESS_AUTH else 1
+# и обработка событий outbox в запросе (REFERRAL_EVENTS_EAGER): чтение
+# обработчика и удаление обработанных событий
+EVENT_QUERIES = 2 if settings.REFERRAL_EVENTS_EAGER else 0
+
 
 class RegisterView(APIView):
     """Регистрация нового пользователя."""
 
     permission_classes = [permissions.AllowAny]
+    throttle_classes = (ScopedIPRateThrottle,)
+    throttle_scope = 'register'
+    # Проверки username/email и кода с путем реферера, блокировка кода,
+    # пользователь, связь, счетчики реферера и событие outbox
+    query_budget = 14 + AUTH_QUERIES + EVENT_QUERIES
 
     @swagger_auto_schema(
             request_body=UserRegistrationSerializer,
@@ -46,16 +86,63 @@ class RegisterView(APIView):
             status=status.HTTP_201_CREATED
         )
 
-    async def async_post(self, request):
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, self.post, request)
-        return result
+
+class BulkRegisterView(APIView):
+    """Пакетная регистрация пользователей (JSON-массив или NDJSON)."""
+
+    permission_classes = (permissions.IsAdminUser,)
+    parser_classes = (JSONParser, NDJSONParser)
+
+    @swagger_auto_schema(
+        request_body=UserRegistrationSerializer(many=True),
+        responses={
+            200: openapi.Response(
+                'Отчет о регистрации по строкам',
+                openapi.Schema(type=openapi.TYPE_OBJECT)
+            ),
+            400: openapi.Response(
+                'Некорректный формат запроса',
+                openapi.Schema(type=openapi.TYPE_STRING)
+            )
+        }
+    )
+    def post(self, request):
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response(
+                {'detail': 'Ожидается массив пользователей.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > BULK_REGISTRATION_MAX_ROWS:
+            return Response(
+                {'detail': (
+                    'Превышено максимальное число пользователей '
+                    f'в запросе: {BULK_REGISTRATION_MAX_ROWS}.'
+                )},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = list(register_users(rows))
+        created = sum(result['status'] == 'created' for result in results)
+        return Response({
+            'created': created,
+            'failed': len(results) - created,
+            'results': results,
+        })
 
 
 class LoginView(APIView):
     """Аутентификация пользователя."""
 
     permission_classes = [permissions.AllowAny]
+    # Лимиты проверяются до запроса к БД и хеширования пароля; по
+    # аккаунту считаются только неудачные попытки
+    throttle_classes = (ScopedIPRateThrottle, FailedAttemptRateThrottle)
+    throttle_scope = 'login'
+    throttle_target_scope = 'login_target'
+    throttle_target_field = 'username'
+    # Пользователь с кодом и, при смене алгоритма хеша, его сохранение
+    query_budget = 2 + AUTH_QUERIES
 
     @swagger_auto_schema(
         request_body=LoginSerializer,
@@ -71,32 +158,59 @@ class LoginView(APIView):
     )
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        user = authenticate(
-            username=serializer.validated_data['username'],
-            password=serializer.validated_data['password']
-        )
-        if user:
-            refresh = RefreshToken.for_user(user)
-            return Response({
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-            }, status=status.HTTP_200_OK)
-        return Response(
-            {'detail': 'Неверные учетные данные'},
-            status=status.HTTP_401_UNAUTHORIZED
+        try:
+            serializer.is_valid(raise_exception=True)
+        except AuthenticationFailed:
+            FailedAttemptRateThrottle().record_failure(request, self)
+            raise
+        # Пользователь уже загружен и проверен сериализатором
+        refresh = UserClaimsRefreshToken.for_user(
+            serializer.validated_data['user']
         )
-
-    async def async_post(self, request):
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, self.post, request)
-        return result
+        return Response({
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+        }, status=status.HTTP_200_OK)
 
 
 class ReferralCodeView(APIView):
-    """Создание/удаление реферального кода."""
+    """Свой реферальный код: получение, создание и удаление.
+
+    Прежний код удаляется из кэша сразу после фиксации транзакции;
+    новую запись строит обработчик события outbox, записанного в той же
+    транзакции (``api.handlers``).
+    """
+
+    # Код из пула, upsert в точке сохранения, повтор при коллизии кода
+    # и событие outbox
+    query_budget = 7 + AUTH_QUERIES + EVENT_QUERIES
+
+    @swagger_auto_schema(
+        responses={
+            200: openapi.Response(
+                'Реферальный код с числом регистраций',
+                ReferralCodeSerializer
+            ),
+            404: openapi.Response(
+                'У пользователя нет реферального кода',
+                openapi.Schema(type=openapi.TYPE_STRING)
+            )
+        }
+    )
+    def get(self, request):
+        # Счетчик регистраций хранится в строке кода: одно чтение по user_id
+        referral_code = (
+            ReferralCode.objects.filter(user_id=request.user.id).first()
+        )
+        if referral_code is None:
+            return Response(
+                {'detail': 'У вас нет реферального кода.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(ReferralCodeSerializer(referral_code).data)
 
     @swagger_auto_schema(
+            request_body=ReferralCodeCreateSerializer,
             responses={
                 201: openapi.Response(
                     'Создание реферального кода', ReferralCodeSerializer
@@ -108,35 +222,38 @@ class ReferralCodeView(APIView):
             }
     )
     def post(self, request):
+        # request.user может быть ClaimsUser: работаем по id, без модели
         user = request.user
+        params = ReferralCodeCreateSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        expiration_date = (
+            timezone.now() + timezone.timedelta(days=TIME_TO_CODE)
+        )
+        with transaction.atomic():
+            # Истекший код заменяется новым в том же запросе
+            referral_code = create_referral_code(
+                user.id, expiration_date,
+                max_uses=params.validated_data.get('max_uses')
+            )
+            if referral_code is not None:
+                # Воркер может отстать: замененный код не отдается из кэша
+                transaction.on_commit(
+                    lambda: invalidate_referral_code(user.email)
+                )
+                outbox.publish(outbox.REFERRAL_CODE_CREATED, {
+                    'user_id': user.id, 'email': user.email,
+                    'code': referral_code.code,
+                })
 
-        if (hasattr(user, 'referral_code') and not
-           user.referral_code.is_expired()):
+        if referral_code is None:
             return Response(
                 {'detail': 'У вас уже есть активный реферальный код.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        code = str(uuid.uuid4())[:MAX_LENGTH_REFERRAL_CODE]
-        expiration_date = timezone.now() + timezone.timedelta(days=TIME_TO_CODE)
-        referral_code = ReferralCode.objects.create(
-            user=user,
-            code=code,
-            expiration_date=expiration_date
-        )
         serializer = ReferralCodeSerializer(referral_code)
-
-        # Добавляем реферальный код в кеш на 1 день
-        cache_key = f'referral_code_{user.email}'
-        cache.set(cache_key, referral_code, timeout=TIME_TO_CACHE)
-
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    async def async_post(self, request):
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, self.post, request)
-        return result
-
     @swagger_auto_schema(
         responses={
             204: openapi.Response(
@@ -150,117 +267,385 @@ class ReferralCodeView(APIView):
     )
     def delete(self, request):
         user = request.user
+        with transaction.atomic():
+            deleted, _ = (
+                ReferralCode.objects.filter(user_id=user.id).delete()
+            )
+            if deleted:
+                transaction.on_commit(
+                    lambda: invalidate_referral_code(user.email)
+                )
+                outbox.publish(outbox.REFERRAL_CODE_DELETED, {
+                    'user_id': user.id, 'email': user.email,
+                })
 
-        if not hasattr(user, 'referral_code'):
+        if not deleted:
             return Response(
                 {'detail': 'У вас нет активного реферального кода.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Очищаем кеш для реферального кода пользователя
-        cache_key = f'referral_code_{user.email}'
-        cache.delete(cache_key)
 
-        user.referral_code.delete()
         return Response(
             {'detail': 'Реферальный код успешно удален.'},
             status=status.HTTP_204_NO_CONTENT
         )
 
-    async def async_delete(self, request):
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, self.delete, request)
-        return result
-
 
-class GetReferralCodeByEmailView(APIView):
+class GetReferralCodeByEmailView(AsyncAPIView):
     """Получение реферального кода по email реферера."""
 
     permission_classes = (permissions.AllowAny,)
+    # POST только читает данные: запрос обслуживает реплика.
+    # GET - тот же поиск с кэшированием ответа клиентами и прокси.
+    read_only = True
+    # Защита от перебора email: лимиты по IP и по запрошенному email
+    throttle_classes = (ScopedIPRateThrottle, TargetRateThrottle)
+    throttle_scope = 'referral_code_lookup'
+    throttle_target_scope = 'referral_code_target'
+    throttle_target_field = 'email'
+    # При промахе кэша - один запрос пользователя с кодом
+    query_budget = 1 + AUTH_QUERIES
+
+    lookup_responses = {
+        200: openapi.Response(
+            'Получение реферального кода по email реферера',
+            PublicReferralCodeSerializer
+        ),
+        404: openapi.Response(
+            'У пользователя нет активного реферального кода',
+            openapi.Schema(type=openapi.TYPE_STRING)
+        ),
+        400: openapi.Response(
+            'Срок действия реферального кода истек',
+            openapi.Schema(type=openapi.TYPE_STRING)
+        )
+    }
 
-    @swagger_auto_schema(
-        request_body=EmailSerializer,
-        responses={
-            200: openapi.Response(
-                'Получение реферального кода по email реферера',
-                ReferralCodeSerializer
-            ),
-            404: openapi.Response(
-                'У пользователя нет активного реферального кода',
-                openapi.Schema(type=openapi.TYPE_STRING)
-            ),
-            400: openapi.Response(
-                'Срок действия реферального кода истек',
-                openapi.Schema(type=openapi.TYPE_STRING)
-            )
-        }
-    )
-    def post(self, request):
-        email_serializer = EmailSerializer(data=request.data)
+    async def get_referral_code(self, data):
+        """Payload активного кода и ``None`` или ``None`` и ответ-ошибка."""
+        email_serializer = EmailSerializer(data=data)
         email_serializer.is_valid(raise_exception=True)
         email = email_serializer.validated_data.get('email')
-        referrer = get_object_or_404(User, email=email)
 
-        # Проверяем, есть ли реферальный код в кеше
-        cache_key = f'referral_code_{email}'
-        referral_code = cache.get(cache_key)
+        # Сначала ищем код в кеше, при промахе - в БД с записью в кеш
+        referral_code = await aget_referral_code(email)
 
-        try:
-            referral_code = referrer.referral_code
-            # Кешируем реферальный код на 1 день
-            cache.set(cache_key, referral_code, timeout=TIME_TO_CACHE)
-        except ReferralCode.DoesNotExist:
-            return Response(
+        if referral_code == NO_USER:
+            raise Http404
+        if referral_code == NO_CODE:
+            return None, Response(
                 {'detail': 'У этого пользователя нет активного кода.'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        if referral_code.is_expired():
-            return Response(
+        if is_payload_expired(referral_code):
+            return None, Response(
                 {'detail': 'Срок действия реферального кода истек.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        return referral_code, None
+
+    def render_referral_code(self, request, referral_code):
+        if request.accepted_renderer.format == 'json':
+            # Тело ответа отрендерено при записи в кэш
+            return HttpResponse(
+                get_body(referral_code),
+                content_type=request.accepted_renderer.media_type
+            )
+        return Response(get_code_data(referral_code))
 
-        serializer = ReferralCodeSerializer(referral_code)
-        return Response(serializer.data)
+    @swagger_auto_schema(
+        query_serializer=EmailSerializer, responses=lookup_responses
+    )
+    async def get(self, request):
+        """Как POST, но ответ кэшируют клиенты и обратный прокси (ETag,
+        Cache-Control до окончания срока действия кода)."""
+        referral_code, error = await self.get_referral_code(
+            request.query_params
+        )
+        if error is not None:
+            return error
+
+        etag = get_body_etag(get_body(referral_code))
+        response = get_not_modified(request, etag)
+        if response is None:
+            response = set_validators(
+                self.render_referral_code(request, referral_code), etag
+            )
+        # Не дольше записи в кэше приложения и срока действия кода:
+        # удаленный владельцем код общие кэши отдают до max-age
+        patch_cache_control(
+            response, public=True, max_age=get_timeout(referral_code)
+        )
+        return response
+
+    @swagger_auto_schema(
+        request_body=EmailSerializer, responses=lookup_responses
+    )
+    async def post(self, request):
+        referral_code, error = await self.get_referral_code(request.data)
+        if error is not None:
+            return error
+        return self.render_referral_code(request, referral_code)
+
+
+LOOKUP_STATUSES = ('active', 'expired', 'no_code', 'not_found')
+
+
+def get_lookup_result(payload):
+    """Результат поиска по payload кэша: статус и код."""
+    if payload == NO_USER:
+        return {'status': 'not_found'}
+    if payload == NO_CODE:
+        return {'status': 'no_code'}
+    if is_payload_expired(payload):
+        return {'status': 'expired', **get_code_data(payload)}
+    return {'status': 'active', **get_code_data(payload)}
 
-    async def async_get(self, request, email):
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, self.get, request, email)
-        return result
+
+class GetReferralCodesByEmailsView(APIView):
+    """Получение реферальных кодов по списку email рефереров."""
+
+    permission_classes = (permissions.IsAdminUser,)
+    read_only = True
+    # Все промахи кэша - одним запросом пользователей с кодами
+    query_budget = 1 + AUTH_QUERIES
+
+    @swagger_auto_schema(
+        request_body=EmailsSerializer,
+        responses={
+            200: openapi.Response(
+                'Результат поиска для каждого email',
+                openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    additional_properties=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'status': openapi.Schema(
+                                type=openapi.TYPE_STRING,
+                                enum=LOOKUP_STATUSES
+                            ),
+                            'code': openapi.Schema(type=openapi.TYPE_STRING),
+                            'expiration_date': openapi.Schema(
+                                type=openapi.TYPE_STRING,
+                                format=openapi.FORMAT_DATETIME
+                            ),
+                        }
+                    )
+                )
+            ),
+            400: openapi.Response(
+                'Некорректный список email',
+                openapi.Schema(type=openapi.TYPE_STRING)
+            )
+        }
+    )
+    def post(self, request):
+        serializer = EmailsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        payloads = get_referral_codes(
+            dict.fromkeys(serializer.validated_data['emails'])
+        )
+        return Response({
+            email: get_lookup_result(payload)
+            for email, payload in payloads.items()
+        })
 
 
-class ReferralsListView(APIView):
+class ReferralsListView(AsyncAPIView):
     """Получение списка рефералов."""
 
+    pagination_class = KeysetPagination
+    # Пользователь, наличие рефералов и страница одним JOIN:
+    # N+1 при построении ответа превысит бюджет на любой странице
+    query_budget = 3 + AUTH_QUERIES
+
     @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                'cursor', openapi.IN_QUERY,
+                'Курсор следующей страницы', type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'page_size', openapi.IN_QUERY,
+                'Размер страницы', type=openapi.TYPE_INTEGER
+            ),
+        ],
         responses={
             200: openapi.Response(
                 'Получение списка рефералов',
-                ReferralSerializer
+                ReferralSerializer(many=True)
             ),
             404: openapi.Response(
                 'У пользователя нет рефералов',
                 openapi.Schema(type=openapi.TYPE_STRING)
             )
         }
-    )    
-    def get(self, request, pk):
-        user = get_object_or_404(User, pk=pk)
-        referrals = user.referrals.all()
+    )
+    async def get(self, request, pk):
+        # Версия читается до данных: ответ не старше своего ETag
+        version = await aget_version(pk)
+        if version is not None:
+            response = get_not_modified(request, get_version_etag(version))
+            if response is not None:
+                return response
+
+        if not await User.objects.filter(pk=pk).aexists():
+            raise Http404
+        if version is None:
+            version = await aget_version(pk, create=True)
+
+        referrals = (
+            ReferralRelationship.objects
+            .filter(referrer_id=pk)
+            .values('id', **REFERRAL_VALUES)
+        )
+        paginator = self.pagination_class()
 
-        if not referrals:
+        if ('cursor' not in request.query_params
+           and not await referrals.aexists()):
             return Response(
                 {'detail': 'У этого пользователя нет рефералов.'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        serializer = ReferralSerializer(referrals, many=True)
-        return Response(serializer.data)
+        page = await paginator.apaginate_queryset(
+            referrals, request, view=self
+        )
+        for row in page:
+            del row['id']  # нужен только для курсора
+        response = paginator.get_paginated_response(page)
+        if version is None:
+            # Версии отключены: кэш не общий для процессов
+            return response
+        return set_validators(response, get_version_etag(version))
+
+
+class ReferrerStatsView(AsyncAPIView):
+    """Счетчики рефералов пользователя."""
+
+    query_budget = 2 + AUTH_QUERIES
+
+    @swagger_auto_schema(
+        responses={
+            200: openapi.Response(
+                'Число рефералов и конвертированных рефералов',
+                ReferrerStatsSerializer
+            )
+        }
+    )
+    async def get(self, request, pk):
+        stats = await (
+            ReferrerStats.objects.filter(referrer_id=pk)
+            .values(*REFERRER_STATS_FIELDS, **REFERRER_STATS_VALUES)
+            .afirst()
+        )
+        if stats is None:
+            # Счетчиков нет у пользователей без рефералов
+            username = await (
+                User.objects.filter(pk=pk).values_list('username', flat=True)
+                .afirst()
+            )
+            if username is None:
+                raise Http404
+            stats = {
+                'referrer': pk, 'referrals_count': 0, 'converted_count': 0,
+                'username': username,
+            }
+        return Response(stats)
+
+
+class LeaderboardView(AsyncAPIView):
+    """Рейтинг рефереров по числу рефералов."""
+
+    query_budget = 1 + AUTH_QUERIES
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                'limit', openapi.IN_QUERY,
+                'Размер рейтинга', type=openapi.TYPE_INTEGER
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                'Топ рефереров', ReferrerStatsSerializer(many=True)
+            )
+        }
+    )
+    async def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', LEADERBOARD_SIZE))
+        except ValueError:
+            limit = LEADERBOARD_SIZE
+        limit = max(1, min(limit, MAX_LEADERBOARD_SIZE))
+        leaders = get_leaderboard(limit).values(
+            *REFERRER_STATS_FIELDS, **REFERRER_STATS_VALUES
+        )
+        return Response([stats async for stats in leaders])
+
+
+class ReferralsExportView(APIView):
+    """Потоковая выгрузка всего дерева рефералов (NDJSON/CSV)."""
 
-    async def async_get(self, request, referrer_id):
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None, self.get, request, referrer_id
+    permission_classes = (permissions.IsAuthenticated,)
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                'file_format', openapi.IN_QUERY,
+                'Формат выгрузки', type=openapi.TYPE_STRING,
+                enum=sorted(EXPORT_FORMATS), default='ndjson'
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                'Выгрузка дерева рефералов',
+                openapi.Schema(type=openapi.TYPE_STRING)
+            ),
+            400: openapi.Response(
+                'Неподдерживаемый формат выгрузки',
+                openapi.Schema(type=openapi.TYPE_STRING)
+            )
+        }
+    )
+    def get(self, request, pk):
+        if request.user.pk != pk and not request.user.is_staff:
+            raise PermissionDenied
+        if not User.objects.filter(pk=pk).exists():
+            raise Http404
+
+        export_format = request.query_params.get('file_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'detail': 'Неподдерживаемый формат выгрузки.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        response = StreamingHttpResponse(
+            export_referral_tree(pk, export_format),
+            content_type=EXPORT_FORMATS[export_format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="referrals_{pk}.{export_format}"'
         )
-        return result
+        return response
+
+
+class CacheStatsView(APIView):
+    """Счетчики попаданий/промахов кэша текущего процесса."""
+
+    permission_classes = (permissions.IsAdminUser,)
+
+    @swagger_auto_schema(
+        responses={
+            200: openapi.Response(
+                'Статистика кэша по уровням',
+                openapi.Schema(type=openapi.TYPE_OBJECT)
+            )
+        }
+    )
+    def get(self, request):
+        if not hasattr(cache, 'stats'):
+            return Response({})
+        return Response(cache.stats())
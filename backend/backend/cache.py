@@ -0,0 +1,467 @@
+"""Двухуровневый кэш: локальный LRU (L1) перед общим кэшем (L2).
+
+L1 живет в памяти процесса и отвечает без сетевых запросов, L2 - любой
+кэш из ``settings.CACHES`` (Redis, LocMem). Изменения ключей рассылаются
+через Redis pub/sub, чтобы остальные воркеры вытеснили устаревшие
+записи из своего L1.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter, OrderedDict
+
+from asgiref.sync import AsyncToSync, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.functional import cached_property
+
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Потокобезопасный LRU-словарь ограниченного размера с TTL."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        expires_at = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, _MISSING) is not _MISSING
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SharedState:
+    """Состояние кэша, общее для всех потоков процесса.
+
+    Обработчик ``caches`` создает экземпляр бэкенда в каждом потоке,
+    поэтому L1, счетчики и подписка на инвалидации хранятся на уровне
+    модуля по имени кэша, как в ``LocMemCache``.
+    """
+
+    def __init__(self, max_entries):
+        self.l1 = LRUCache(max_entries)
+        self.node_id = uuid.uuid4().hex
+        self.subscriber = None
+        self.subscriber_lock = threading.Lock()
+        self.async_clients = weakref.WeakKeyDictionary()
+        self.async_clients_lock = threading.Lock()
+        self._counters = Counter()
+        self._counters_lock = threading.Lock()
+
+    def count(self, name, value=1):
+        with self._counters_lock:
+            self._counters[name] += value
+
+    def counters(self):
+        with self._counters_lock:
+            return dict(self._counters)
+
+
+_states = {}
+_states_lock = threading.Lock()
+
+
+def get_shared_state(name, max_entries):
+    with _states_lock:
+        state = _states.get(name)
+        if state is None:
+            state = _states[name] = SharedState(max_entries)
+        return state
+
+
+def is_call_loop(loop):
+    """Loop, созданный ``async_to_sync`` на один вызов (WSGI)."""
+    return loop in AsyncToSync.loop_thread_executors
+
+
+async def hold_async_client(client):
+    """Держит клиент до завершения event loop.
+
+    ``loop.shutdown_asyncgens()`` (``asyncio.run``, серверы ASGI)
+    закрывает генератор, а с ним и соединения клиента.
+    """
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+class TieredCache(BaseCache):
+    """Кэш-бэкенд Django с локальным L1 перед кэшем L2.
+
+    Параметры ``OPTIONS``:
+
+    - ``L2`` - алиас кэша второго уровня в ``settings.CACHES``;
+    - ``L1_MAX_ENTRIES`` - максимальное число записей L1;
+    - ``L1_TIMEOUT`` - максимальное время жизни записи в L1, сек;
+    - ``BROADCAST_CHANNEL`` - канал Redis для рассылки инвалидаций
+      (``None`` отключает рассылку).
+
+    Если L2 - django_redis, асинхронные методы (aget/aset/adelete)
+    в долгоживущем event loop обращаются к Redis через асинхронный
+    клиент redis.asyncio в формате ключей и значений django_redis.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = options['L2']
+        self._state = get_shared_state(
+            location or self._l2_alias, options.get('L1_MAX_ENTRIES', 10000)
+        )
+        self._l1 = self._state.l1
+        self._l1_timeout = options.get('L1_TIMEOUT', 30)
+        self._channel = options.get('BROADCAST_CHANNEL')
+
+    @cached_property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def stats(self):
+        """Счетчики попаданий/промахов по уровням кэша (по процессу)."""
+        counters = self._state.counters()
+        return {
+            'l1': {
+                'hits': counters.get('l1_hits', 0),
+                'misses': counters.get('l1_misses', 0),
+                'size': len(self._l1),
+            },
+            'l2': {
+                'hits': counters.get('l2_hits', 0),
+                'misses': counters.get('l2_misses', 0),
+            },
+        }
+
+    def _relative_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            return self.default_timeout
+        return timeout
+
+    def _l1_set(self, key, value, timeout):
+        if timeout is None:
+            timeout = self._l1_timeout
+        else:
+            timeout = min(timeout, self._l1_timeout)
+        if timeout > 0:
+            self._l1.set(key, value, timeout)
+
+    def _l1_get(self, key):
+        self._ensure_subscriber()
+        value = self._l1.get(key, _MISSING)
+        self._state.count('l1_misses' if value is _MISSING else 'l1_hits')
+        return value
+
+    def get(self, key, default=None, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        value = self._l1_get(l1_key)
+        if value is not _MISSING:
+            return value
+        value = self.l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self._state.count('l2_misses')
+            return default
+        self._state.count('l2_hits')
+        self._l1_set(l1_key, value, None)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        l2_keys = []
+        for key in keys:
+            value = self._l1_get(self.make_and_validate_key(key, version))
+            if value is _MISSING:
+                l2_keys.append(key)
+            else:
+                found[key] = value
+        if l2_keys:
+            l2_found = self.l2.get_many(l2_keys, version=version)
+            self._state.count('l2_hits', len(l2_found))
+            self._state.count('l2_misses', len(l2_keys) - len(l2_found))
+            for key, value in l2_found.items():
+                self._l1_set(self.make_key(key, version), value, None)
+            found.update(l2_found)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        self.l2.set(key, value, timeout=timeout, version=version)
+        self._l1_set(l1_key, value, self._relative_timeout(timeout))
+        self._broadcast([l1_key])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed_keys = self.l2.set_many(data, timeout=timeout, version=version)
+        l1_timeout = self._relative_timeout(timeout)
+        l1_keys = []
+        for key, value in data.items():
+            l1_key = self.make_and_validate_key(key, version=version)
+            if key not in failed_keys:
+                self._l1_set(l1_key, value, l1_timeout)
+            l1_keys.append(l1_key)
+        self._broadcast(l1_keys)
+        return failed_keys
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        added = self.l2.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._l1_set(l1_key, value, self._relative_timeout(timeout))
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        self._l1.delete(l1_key)
+        deleted = self.l2.delete(key, version=version)
+        self._broadcast([l1_key])
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        l1_keys = [self.make_and_validate_key(key, version) for key in keys]
+        for l1_key in l1_keys:
+            self._l1.delete(l1_key)
+        self.l2.delete_many(keys, version=version)
+        self._broadcast(l1_keys)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def incr(self, key, delta=1, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        self._l1.delete(l1_key)
+        value = self.l2.incr(key, delta, version=version)
+        self._broadcast([l1_key])
+        return value
+
+    def clear(self):
+        self._l1.clear()
+        self.l2.clear()
+        self._broadcast(None)
+
+    # Асинхронный доступ к L2
+
+    @cached_property
+    def _l2_redis_url(self):
+        """URL Redis для асинхронного клиента, если L2 - django_redis."""
+        params = settings.CACHES[self._l2_alias]
+        if not params['BACKEND'].startswith('django_redis.'):
+            return None
+        location = params['LOCATION']
+        if isinstance(location, (list, tuple)):
+            location = location[0]
+        return location.split(',')[0]
+
+    def _use_async_client(self):
+        """Клиент redis.asyncio - только в долгоживущем event loop.
+
+        Под WSGI ``async_to_sync`` создает loop на каждый вызов, и клиент
+        в нем открывал бы соединение на каждый запрос: там L2 вызывается
+        синхронно (``sync_to_async``) через общий пул соединений.
+        """
+        return (
+            self._l2_redis_url is not None
+            and not is_call_loop(asyncio.get_running_loop())
+        )
+
+    async def _get_async_client(self):
+        # Соединения redis.asyncio привязаны к своему event loop: один
+        # клиент на loop, закрывается при его завершении
+        from redis import asyncio as aioredis
+
+        loop = asyncio.get_running_loop()
+        state = self._state
+        with state.async_clients_lock:
+            entry = state.async_clients.get(loop)
+            if entry is not None:
+                return entry[0]
+            client = aioredis.from_url(self._l2_redis_url)
+            holder = hold_async_client(client)
+            state.async_clients[loop] = client, holder
+        # Первый шаг регистрирует генератор в loop
+        await holder.__anext__()
+        return client
+
+    async def _l2_aget(self, key, version):
+        if not self._use_async_client():
+            return await self.l2.aget(key, _MISSING, version=version)
+        from redis.exceptions import RedisError
+
+        client = self.l2.client
+        try:
+            redis = await self._get_async_client()
+            value = await redis.get(client.make_key(key, version=version))
+        except RedisError:
+            logger.warning('Redis недоступен, промах кэша.')
+            return _MISSING
+        return _MISSING if value is None else client.decode(value)
+
+    async def _l2_aset(self, key, value, timeout, version):
+        if not self._use_async_client():
+            return await self.l2.aset(
+                key, value, timeout=timeout, version=version
+            )
+        from redis.exceptions import RedisError
+
+        client = self.l2.client
+        nkey = client.make_key(key, version=version)
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.l2.default_timeout
+        try:
+            redis = await self._get_async_client()
+            if timeout is not None and timeout <= 0:
+                await redis.delete(nkey)
+            else:
+                await redis.set(
+                    nkey, client.encode(value),
+                    px=None if timeout is None else int(timeout * 1000)
+                )
+        except RedisError:
+            logger.warning('Redis недоступен, запись в кэш пропущена.')
+
+    async def _l2_adelete(self, key, version):
+        if not self._use_async_client():
+            return await self.l2.adelete(key, version=version)
+        from redis.exceptions import RedisError
+
+        try:
+            redis = await self._get_async_client()
+            return bool(await redis.delete(
+                self.l2.client.make_key(key, version=version)
+            ))
+        except RedisError:
+            logger.warning('Redis недоступен, удаление из кэша пропущено.')
+            return False
+
+    async def aget(self, key, default=None, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        value = self._l1_get(l1_key)
+        if value is not _MISSING:
+            return value
+        value = await self._l2_aget(key, version)
+        if value is _MISSING:
+            self._state.count('l2_misses')
+            return default
+        self._state.count('l2_hits')
+        self._l1_set(l1_key, value, None)
+        return value
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        await self._l2_aset(key, value, timeout, version)
+        self._l1_set(l1_key, value, self._relative_timeout(timeout))
+        await self._abroadcast([l1_key])
+
+    async def adelete(self, key, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        self._l1.delete(l1_key)
+        deleted = await self._l2_adelete(key, version)
+        await self._abroadcast([l1_key])
+        return deleted
+
+    # Рассылка инвалидаций между воркерами
+
+    @cached_property
+    def _redis(self):
+        if self._channel is None:
+            return None
+        try:
+            from django_redis import get_redis_connection
+            return get_redis_connection(self._l2_alias)
+        except (ImportError, NotImplementedError):
+            return None
+
+    def _broadcast(self, keys):
+        if self._redis is None:
+            return
+        message = json.dumps({'node': self._state.node_id, 'keys': keys})
+        try:
+            self._redis.publish(self._channel, message)
+        except Exception:
+            logger.warning('Не удалось разослать инвалидацию кэша.')
+
+    async def _abroadcast(self, keys):
+        if self._redis is None:
+            return
+        if not self._use_async_client():
+            await sync_to_async(self._broadcast)(keys)
+            return
+        message = json.dumps({'node': self._state.node_id, 'keys': keys})
+        try:
+            redis = await self._get_async_client()
+            await redis.publish(self._channel, message)
+        except Exception:
+            logger.warning('Не удалось разослать инвалидацию кэша.')
+
+    def _ensure_subscriber(self):
+        # Один поток подписки на процесс, а не на каждый экземпляр
+        state = self._state
+        if state.subscriber is not None or self._redis is None:
+            return
+        with state.subscriber_lock:
+            if state.subscriber is None:
+                state.subscriber = threading.Thread(
+                    target=self._listen, name='cache-invalidation',
+                    daemon=True
+                )
+                state.subscriber.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel)
+                # Пока подписка не работала, L1 мог устареть
+                self._l1.clear()
+                for message in pubsub.listen():
+                    self._handle_invalidation(message['data'])
+            except Exception:
+                logger.warning('Подписка на инвалидации кэша прервана.')
+                time.sleep(1)
+
+    def _handle_invalidation(self, data):
+        message = json.loads(data)
+        if message['node'] == self._state.node_id:
+            return
+        if message['keys'] is None:
+            self._l1.clear()
+            return
+        for key in message['keys']:
+            self._l1.delete(key)
@@ -0,0 +1,105 @@
+"""Маршрутизация запросов между основной БД и репликами чтения.
+
+Запись всегда идет в основную БД (``default``), чтение - в случайную
+реплику из ``settings.DATABASE_REPLICAS``. Чтобы пользователь видел
+свои изменения несмотря на задержку репликации:
+
+- после первой записи в рамках запроса все чтения этого запроса идут
+  в основную БД;
+- ``PrimaryPinMiddleware`` ставит cookie, и следующие запросы клиента
+  в течение ``DATABASE_PRIMARY_PIN_SECONDS`` тоже читают из основной БД;
+- запросы с небезопасным методом (POST, DELETE...) читают из основной
+  БД, если представление не объявило ``read_only = True``.
+
+Вне HTTP-запроса (команды, бенчмарки) чтение идет в реплики до первой
+записи, ``use_primary()`` сразу переключает его на основную БД.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.deprecation import MiddlewareMixin
+
+
+PRIMARY_PIN_COOKIE = 'db_primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    __slots__ = ('pinned', 'written')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.written = False
+
+
+def pin_to_primary():
+    """Направляет оставшиеся чтения текущего запроса в основную БД."""
+    state = _state.get()
+    if state is None:
+        state = RoutingState()
+        _state.set(state)
+    state.pinned = True
+    return state
+
+
+@contextmanager
+def use_primary():
+    token = _state.set(RoutingState(pinned=True))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        state = _state.get()
+        if not replicas or (state is not None and state.pinned):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary().written = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная БД
+        return True
+
+
+class PrimaryPinMiddleware(MiddlewareMixin):
+    """Закрепляет чтение за основной БД после записи клиента."""
+
+    def process_request(self, request):
+        _state.set(RoutingState(
+            pinned=PRIMARY_PIN_COOKIE in request.COOKIES
+        ))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None) or getattr(
+            view_func, 'view_class', None
+        )
+        if (request.method not in SAFE_METHODS
+           and not getattr(view_class, 'read_only', False)):
+            pin_to_primary()
+
+    def process_response(self, request, response):
+        state = _state.get()
+        # Без реплик все чтения и так идут в основную БД
+        if (settings.DATABASE_REPLICAS
+           and state is not None and state.written):
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE, '1',
+                max_age=settings.DATABASE_PRIMARY_PIN_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        _state.set(None)
+        return response
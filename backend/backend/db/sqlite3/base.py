@@ -0,0 +1,53 @@
+"""SQLite для однонодовых развертываний.
+
+Дополнительные параметры ``OPTIONS`` (как в Django 5.1):
+
+- ``init_command`` - SQL, выполняемый при открытии соединения
+  (PRAGMA journal_mode=WAL, synchronous=NORMAL, busy_timeout);
+- ``transaction_mode`` - режим BEGIN для транзакций (``DEFERRED``,
+  ``IMMEDIATE``, ``EXCLUSIVE``). С ``IMMEDIATE`` блокировка записи
+  берется в начале транзакции, и ожидание ``busy_timeout`` работает,
+  а не завершается ошибкой "database is locked" при повышении
+  блокировки посреди транзакции.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.init_command = options.get('init_command')
+        self.transaction_mode = options.get('transaction_mode')
+        if self.transaction_mode is not None:
+            self.transaction_mode = self.transaction_mode.upper()
+            if self.transaction_mode not in TRANSACTION_MODES:
+                raise ImproperlyConfigured(
+                    'settings.DATABASES: transaction_mode должен быть '
+                    'одним из ' + ', '.join(TRANSACTION_MODES) + '.'
+                )
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('init_command', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        if self.init_command:
+            for statement in self.init_command.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            return super()._start_transaction_under_autocommit()
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
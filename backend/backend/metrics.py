@@ -0,0 +1,352 @@
+"""Метрики запросов в формате Prometheus и бюджет запросов к БД.
+
+``MetricsMiddleware`` собирает по каждому представлению и методу:
+время ответа, число и время запросов к БД, обращения к кэшу
+реферальных кодов (попадания/промахи) и время хеширования паролей.
+Метрики хранятся в памяти процесса и отдаются представлением
+``metrics_view`` (``/metrics``); при нескольких воркерах каждый
+отдает свои значения.
+
+Представление может объявить ``query_budget`` - максимум запросов
+к БД на один запрос. Превышение учитывается в метрике и пишется
+в лог, а с ``QUERY_BUDGET_RAISE = True`` (в тестах) выбрасывает
+``QueryBudgetExceeded``. Для тестов есть и контекстный менеджер
+``query_budget``.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter as CounterDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import (
+    HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+)
+from django.utils.crypto import constant_time_compare
+
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+def escape(value):
+    return (
+        str(value).replace('\\', r'\\').replace('"', r'\"')
+        .replace('\n', r'\n')
+    )
+
+
+def format_labels(labelnames, values):
+    if not labelnames:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{escape(value)}"'
+        for name, value in zip(labelnames, values)
+    ) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labelnames)
+
+    def render(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.type}'
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in sorted(values):
+            yield from self.render_value(key, value)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render_value(self, key, value):
+        labels = format_labels(self.labelnames, key)
+        yield f'{self.name}{labels} {format_value(value)}'
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Счетчики по корзинам, затем сумма и число наблюдений
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render_value(self, key, state):
+        labelnames = self.labelnames + ('le',)
+        for bound, count in zip(self.buckets, state):
+            labels = format_labels(labelnames, key + (format_value(bound),))
+            yield f'{self.name}_bucket{labels} {count}'
+        labels = format_labels(labelnames, key + ('+Inf',))
+        yield f'{self.name}_bucket{labels} {state[-1]}'
+        labels = format_labels(self.labelnames, key)
+        yield f'{self.name}_sum{labels} {format_value(state[-2])}'
+        yield f'{self.name}_count{labels} {state[-1]}'
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        return '\n'.join(
+            line for metric in self._metrics for line in metric.render()
+        ) + '\n'
+
+
+REGISTRY = Registry()
+REQUEST_LABELS = ('view', 'method')
+
+http_requests = REGISTRY.register(Counter(
+    'http_requests_total', 'Число HTTP-запросов.',
+    REQUEST_LABELS + ('status',)
+))
+http_request_duration = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'Время обработки запроса.',
+    REQUEST_LABELS
+))
+http_request_db_queries = REGISTRY.register(Histogram(
+    'http_request_db_queries', 'Число запросов к БД на HTTP-запрос.',
+    REQUEST_LABELS, buckets=QUERY_BUCKETS
+))
+http_request_db_duration = REGISTRY.register(Histogram(
+    'http_request_db_duration_seconds',
+    'Суммарное время запросов к БД на HTTP-запрос.', REQUEST_LABELS
+))
+http_request_password_hash_duration = REGISTRY.register(Histogram(
+    'http_request_password_hash_seconds',
+    'Суммарное время хеширования паролей на HTTP-запрос.', REQUEST_LABELS
+))
+http_request_cache = REGISTRY.register(Counter(
+    'http_request_cache_total', 'Обращения к кэшу: попадания и промахи.',
+    REQUEST_LABELS + ('cache', 'result')
+))
+http_request_query_budget_exceeded = REGISTRY.register(Counter(
+    'http_request_query_budget_exceeded_total',
+    'HTTP-запросы, превысившие бюджет запросов к БД.', REQUEST_LABELS
+))
+password_hash_duration = REGISTRY.register(Histogram(
+    'password_hash_seconds',
+    'Время хеширования и проверки паролей (с ожиданием пула).',
+    ('operation',)
+))
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Представление выполнило больше запросов к БД, чем разрешено."""
+
+
+class RequestMetrics:
+    """Метрики одного запроса (или блока ``collect``)."""
+
+    __slots__ = ('queries', 'db_time', 'password_hash_time', 'cache')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.password_hash_time = 0.0
+        self.cache = CounterDict()
+
+
+# Активные сборщики: запрос и вложенные блоки query_budget.
+# Объекты изменяемые, поэтому их видят и потоки sync_to_async.
+_collectors = ContextVar('metrics_collectors', default=())
+
+
+def record_query(duration):
+    for metrics in _collectors.get():
+        metrics.queries += 1
+        metrics.db_time += duration
+
+
+def record_password_hash(operation, duration):
+    password_hash_duration.observe(duration, operation=operation)
+    for metrics in _collectors.get():
+        metrics.password_hash_time += duration
+
+
+def record_cache(cache, hit):
+    for metrics in _collectors.get():
+        metrics.cache[cache, 'hit' if hit else 'miss'] += 1
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    if not _collectors.get():
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record_query(time.perf_counter() - start)
+
+
+def install_query_wrapper(connection, **kwargs):
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+connection_created.connect(
+    lambda sender, connection, **kwargs: install_query_wrapper(connection),
+    weak=False, dispatch_uid='metrics_query_wrapper'
+)
+
+
+@contextmanager
+def collect():
+    """Собирает метрики кода внутри блока, возвращает ``RequestMetrics``."""
+    # Соединения, открытые до подключения сигнала
+    for connection in connections.all(initialized_only=True):
+        install_query_wrapper(connection)
+    metrics = RequestMetrics()
+    token = _collectors.set(_collectors.get() + (metrics,))
+    try:
+        yield metrics
+    finally:
+        _collectors.reset(token)
+
+
+@contextmanager
+def query_budget(limit):
+    """Проверка для тестов: блок выполняет не больше ``limit`` запросов.
+
+    В отличие от ``assertNumQueries`` учитывает все соединения и потоки
+    (асинхронные представления выполняют запросы в sync_to_async).
+    """
+    with collect() as metrics:
+        yield metrics
+    if metrics.queries > limit:
+        raise QueryBudgetExceeded(
+            f'Выполнено запросов к БД: {metrics.queries}, '
+            f'бюджет: {limit}.'
+        )
+
+
+def get_view(request):
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched', None
+    func = match.func
+    view_class = getattr(func, 'cls', None) or getattr(
+        func, 'view_class', None
+    )
+    return match.view_name or match.route, view_class
+
+
+class MetricsMiddleware:
+    """Собирает метрики запроса; должен стоять первым в MIDDLEWARE."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with collect() as metrics:
+            response = self.get_response(request)
+        self.observe(request, response, metrics, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with collect() as metrics:
+            response = await self.get_response(request)
+        self.observe(request, response, metrics, time.perf_counter() - start)
+        return response
+
+    def observe(self, request, response, metrics, duration):
+        view, view_class = get_view(request)
+        labels = {'view': view, 'method': request.method}
+        http_requests.inc(status=response.status_code, **labels)
+        http_request_duration.observe(duration, **labels)
+        http_request_db_queries.observe(metrics.queries, **labels)
+        http_request_db_duration.observe(metrics.db_time, **labels)
+        if metrics.password_hash_time:
+            http_request_password_hash_duration.observe(
+                metrics.password_hash_time, **labels
+            )
+        for (cache, result), count in metrics.cache.items():
+            http_request_cache.inc(
+                count, cache=cache, result=result, **labels
+            )
+
+        budget = getattr(view_class, 'query_budget', None)
+        if budget is not None and metrics.queries > budget:
+            http_request_query_budget_exceeded.inc(**labels)
+            message = (
+                f'{request.method} {view}: запросов к БД '
+                f'{metrics.queries}, бюджет {budget}.'
+            )
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+
+def metrics_view(request):
+    """Метрики процесса в текстовом формате Prometheus.
+
+    Без ``METRICS_TOKEN`` эндпоинт отключен (404).
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        return HttpResponseNotFound()
+    if not constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,7 @@
+"""Общий код для пулов дочерних процессов (ProcessPoolExecutor)."""
+
+
+def setup_worker():
+    """Инициализация Django в дочернем процессе (для start method spawn)."""
+    import django
+    django.setup()
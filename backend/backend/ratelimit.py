@@ -0,0 +1,193 @@
+"""Ограничение частоты запросов скользящим окном.
+
+Счетчик скользящего окна: число событий в текущем окне плюс число
+событий в предыдущем окне, взвешенное долей, которую предыдущее окно
+еще перекрывает. Проверка и увеличение счетчика - один вызов
+Lua-скрипта в Redis (атомарно и за один сетевой запрос). Без Redis
+или при его недоступности счетчики хранятся в памяти процесса.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.utils.functional import cached_property
+
+from .cache import LRUCache
+
+
+logger = logging.getLogger(__name__)
+
+# KEYS: счетчик текущего окна, счетчик предыдущего окна
+# ARGV: лимит, вес предыдущего окна, время жизни счетчика (сек)
+SLIDING_WINDOW_SCRIPT = '''
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previous * tonumber(ARGV[2]) + current >= tonumber(ARGV[1]) then
+    return {0, current, previous}
+end
+current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return {1, current, previous}
+'''
+
+
+def get_window(now, duration):
+    """Номер текущего окна и вес предыдущего окна."""
+    window = int(now // duration)
+    return window, 1 - (now - window * duration) / duration
+
+
+def get_wait(limit, duration, current, previous, now):
+    """Через сколько секунд запрос будет разрешен."""
+    _, weight = get_window(now, duration)
+    elapsed = (1 - weight) * duration
+    if current >= limit or not previous:
+        return duration - elapsed
+    # Вес предыдущего окна должен упасть до (limit - 1 - current) / previous
+    share = (limit - 1 - current) / previous
+    return max(0.0, duration * (1 - share) - elapsed)
+
+
+class LocalStore:
+    """Счетчики в памяти процесса: ``{key: [window, current, previous]}``."""
+
+    def __init__(self, max_entries):
+        self._counters = LRUCache(max_entries)
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, duration, now):
+        return self._update(key, limit, duration, now, increment=True)
+
+    def check(self, key, limit, duration, now):
+        return self._update(key, limit, duration, now, increment=False)
+
+    def _update(self, key, limit, duration, now, increment):
+        window, weight = get_window(now, duration)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or counter[0] < window - 1:
+                counter = [window, 0, 0]
+            elif counter[0] == window - 1:
+                counter = [window, 0, counter[1]]
+            _, current, previous = counter
+            allowed = previous * weight + current < limit
+            if increment:
+                if allowed:
+                    counter[1] += 1
+                self._counters.set(key, counter, 2 * duration)
+        return allowed, counter[1], previous
+
+
+class RedisStore:
+    """Счетчики в Redis, проверка и увеличение - одним Lua-скриптом."""
+
+    def __init__(self, client, prefix):
+        self._prefix = prefix
+        self._script = client.register_script(SLIDING_WINDOW_SCRIPT)
+        self._client = client
+
+    def get_keys(self, key, window):
+        # Хеш-тег {key}: оба счетчика в одном слоте Redis Cluster
+        return [
+            f'{self._prefix}:{{{key}}}:{window}',
+            f'{self._prefix}:{{{key}}}:{window - 1}',
+        ]
+
+    def hit(self, key, limit, duration, now):
+        window, weight = get_window(now, duration)
+        allowed, current, previous = self._script(
+            keys=self.get_keys(key, window),
+            args=[limit, weight, 2 * int(duration) + 1]
+        )
+        return bool(allowed), int(current), int(previous)
+
+    def check(self, key, limit, duration, now):
+        window, weight = get_window(now, duration)
+        current, previous = (
+            int(value or 0)
+            for value in self._client.mget(self.get_keys(key, window))
+        )
+        return previous * weight + current < limit, current, previous
+
+
+class RateLimiter:
+    """Лимиты вида «``limit`` событий за ``duration`` секунд» по ключу.
+
+    Настройки:
+
+    - ``RATE_LIMIT_CACHE`` - алиас кэша django_redis, чей Redis хранит
+      счетчики (с другим кэшем или ``None`` - только память процесса);
+    - ``RATE_LIMIT_LOCAL_MAX_ENTRIES`` - максимум ключей в памяти;
+    - ``RATE_LIMIT_REDIS_RETRY`` - сколько секунд после ошибки Redis
+      использовать счетчики в памяти, не обращаясь к Redis.
+    """
+
+    prefix = 'ratelimit'
+
+    def __init__(self):
+        self._local = LocalStore(settings.RATE_LIMIT_LOCAL_MAX_ENTRIES)
+        self._redis_down_until = 0.0
+
+    @cached_property
+    def _redis(self):
+        alias = settings.RATE_LIMIT_CACHE
+        if alias is None:
+            return None
+        try:
+            from django_redis import get_redis_connection
+            return RedisStore(get_redis_connection(alias), self.prefix)
+        except (ImportError, NotImplementedError):
+            return None
+
+    def hit(self, key, limit, duration):
+        """Учитывает событие, если лимит не исчерпан.
+
+        Возвращает ``(allowed, wait)``: ``wait`` - через сколько секунд
+        повторить отклоненный запрос.
+        """
+        return self._call('hit', key, limit, duration)
+
+    def check(self, key, limit, duration):
+        """Как ``hit``, но не учитывает событие."""
+        return self._call('check', key, limit, duration)
+
+    def _call(self, method, key, limit, duration):
+        now = time.time()
+        result = None
+        if self._redis is not None and time.monotonic() >= (
+            self._redis_down_until
+        ):
+            try:
+                result = getattr(self._redis, method)(
+                    key, limit, duration, now
+                )
+            except Exception:
+                logger.warning(
+                    'Redis недоступен, лимиты считаются в памяти процесса.'
+                )
+                self._redis_down_until = (
+                    time.monotonic() + settings.RATE_LIMIT_REDIS_RETRY
+                )
+        if result is None:
+            result = getattr(self._local, method)(key, limit, duration, now)
+        allowed, current, previous = result
+        if allowed:
+            return True, None
+        return False, get_wait(limit, duration, current, previous, now)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
@@ -1,10 +1,13 @@
 from datetime import timedelta
+import json
 import os
 from pathlib import Path
 
 from django.core.management.utils import get_random_secret_key
 from dotenv import load_dotenv
 
+from backend.db.config import parse_database_url, sqlite_config
+
 
 load_dotenv()
 
@@ -42,10 +45,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым: время ответа и запросы к БД всех остальных слоев
+    'backend.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'backend.db.routers.PrimaryPinMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -72,46 +78,201 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+# Аутентификация по claims JWT без запроса пользователя к БД
+JWT_STATELESS_AUTH = os.getenv('JWT_STATELESS_AUTH', 'True') == 'True'
+
 REST_FRAMEWORK = {
+    'EXCEPTION_HANDLER': 'api.exceptions.exception_handler',
+
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'rest_framework_simplejwt.authentication.'
+        + ('JWTStatelessUserAuthentication' if JWT_STATELESS_AUTH
+           else 'JWTAuthentication'),
     ),
+
+    # JSON через orjson (без него - стандартный json)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.AnonRateThrottle',
+        'api.throttling.UserRateThrottle',
+    ],
+    # Лимиты скользящего окна: запросов в секунду/минуту/час/день
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': os.getenv('THROTTLE_ANON_RATE', '300/min'),
+        'user': os.getenv('THROTTLE_USER_RATE', '1000/min'),
+        # Вход: по IP и по имени пользователя (перебор паролей)
+        'login': os.getenv('THROTTLE_LOGIN_RATE', '20/min'),
+        'login_target': os.getenv('THROTTLE_LOGIN_TARGET_RATE', '5/min'),
+        'register': os.getenv('THROTTLE_REGISTER_RATE', '10/min'),
+        # Код по email: по IP и по email (перебор адресов)
+        'referral_code_lookup': os.getenv(
+            'THROTTLE_REFERRAL_CODE_LOOKUP_RATE', '60/min'
+        ),
+        'referral_code_target': os.getenv(
+            'THROTTLE_REFERRAL_CODE_TARGET_RATE', '10/min'
+        ),
+    },
+    # Число доверенных прокси перед приложением: IP клиента берется из
+    # X-Forwarded-For только при NUM_PROXIES > 0, иначе - REMOTE_ADDR
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES') or 0),
 }
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'TOKEN_USER_CLASS': 'users.authentication.ClaimsUser',
 }
 
+# Кэш процесса для пользователей, загружаемых по claims токена
+USER_CACHE_MAX_ENTRIES = 10000
+USER_CACHE_TIMEOUT = int(os.getenv('USER_CACHE_TIMEOUT', 30))  # секунд
+
 AUTH_USER_MODEL = 'users.ApplicationUser'
 
-CACHES = {
-    "default": {
-        "BACKEND": "django_redis.cache.RedisCache",
-        "LOCATION": "redis://127.0.0.1:6379/1",
-        "OPTIONS": {
-            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+AUTHENTICATION_BACKENDS = ['users.backends.HashingPoolModelBackend']
+
+# Хеширование паролей: пул процессов и ограничение очереди задач.
+# При переполнении очереди запросы получают 503 с Retry-After.
+PASSWORD_HASHING_WORKERS = int(
+    os.getenv('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1)
+)
+PASSWORD_HASHING_MAX_PENDING = int(
+    os.getenv('PASSWORD_HASHING_MAX_PENDING', PASSWORD_HASHING_WORKERS * 4)
+)
+PASSWORD_HASHING_RETRY_AFTER = 1  # секунд
+
+# Алгоритм хеширования (pbkdf2, scrypt, argon2) и его параметры в JSON,
+# например PASSWORD_HASHER_PARAMS={"iterations": 600000}
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'pbkdf2')
+PASSWORD_HASHER_PARAMS = json.loads(os.getenv('PASSWORD_HASHER_PARAMS', '{}'))
+
+PASSWORD_HASHER_CLASSES = {
+    'pbkdf2': 'users.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'users.hashers.ScryptPasswordHasher',
+    'argon2': 'users.hashers.Argon2PasswordHasher',
+}
+
+# Первый хешер используется для новых паролей, остальные - для проверки
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_CLASSES[PASSWORD_HASHER],
+    *(
+        hasher for name, hasher in PASSWORD_HASHER_CLASSES.items()
+        if name != PASSWORD_HASHER
+    ),
+]
+
+# Кэш: локальный LRU (L1) перед общим кэшем (L2).
+# Без REDIS_URL в качестве L2 используется локальный LocMemCache.
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+if REDIS_URL:
+    SHARED_CACHE = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': REDIS_URL,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'IGNORE_EXCEPTIONS': True,
         }
     }
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'backend.cache.TieredCache',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_MAX_ENTRIES': int(os.getenv('CACHE_L1_MAX_ENTRIES', 10000)),
+            'L1_TIMEOUT': int(os.getenv('CACHE_L1_TIMEOUT', 30)),
+            'BROADCAST_CHANNEL': 'cache_invalidation' if REDIS_URL else None,
+        }
+    },
+    'shared': SHARED_CACHE,
 }
 
+# Метрики Prometheus (/metrics): заголовок Authorization: Bearer
+# <METRICS_TOKEN>, без токена эндпоинт отключен
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# Превышение бюджета запросов к БД представления (query_budget) -
+# исключение вместо записи в лог (для тестов)
+QUERY_BUDGET_RAISE = os.getenv('QUERY_BUDGET_RAISE', 'False') == 'True'
+
+# Счетчики лимитов запросов (троттлинга) - в Redis кэша L2,
+# без Redis или при его ошибке - в памяти процесса
+RATE_LIMIT_CACHE = 'shared' if REDIS_URL else None
+RATE_LIMIT_LOCAL_MAX_ENTRIES = 100000
+RATE_LIMIT_REDIS_RETRY = 5  # секунд без обращений к Redis после ошибки
+
+# События outbox (referral_system.outbox) обрабатывает воркер
+# run_referral_worker. Без Redis кэш воркера не виден веб-процессам,
+# поэтому по умолчанию события обрабатываются в процессе после коммита;
+# ошибки повторяет воркер
+REFERRAL_EVENTS_EAGER = os.getenv(
+    'REFERRAL_EVENTS_EAGER', str(not REDIS_URL)
+) == 'True'
+
+# Версии списка рефералов (ETag и 304) корректны, только если кэш общий
+# для всех процессов
+REFERRALS_VERSIONS = bool(REDIS_URL)
+
 # Настройка для whitenoise
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# БД из DATABASE_URL (postgres://... или sqlite:///...).
+# Без DATABASE_URL используется SQLite в режиме WAL рядом с проектом.
+DATABASE_URL = os.getenv('DATABASE_URL', '')
+# Время жизни постоянного соединения, сек (0 - соединение на запрос)
+DATABASE_CONN_MAX_AGE = int(os.getenv('DATABASE_CONN_MAX_AGE', 60))
+# True, если PostgreSQL доступен через PgBouncer в режиме transaction
+DATABASE_PGBOUNCER = os.getenv('DATABASE_PGBOUNCER', 'False') == 'True'
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': (
+        parse_database_url(
+            DATABASE_URL,
+            conn_max_age=DATABASE_CONN_MAX_AGE,
+            conn_health_checks=True,
+            disable_server_side_cursors=DATABASE_PGBOUNCER,
+        )
+        if DATABASE_URL else sqlite_config(BASE_DIR / 'db.sqlite3')
+    ),
 }
 
+# Реплики чтения через запятую (URL в том же формате, что DATABASE_URL)
+DATABASE_REPLICAS = []
+for index, url in enumerate(filter(None, os.getenv(
+    'DATABASE_REPLICA_URLS', ''
+).split(','))):
+    DATABASES[f'replica_{index}'] = {
+        **parse_database_url(
+            url.strip(),
+            conn_max_age=DATABASE_CONN_MAX_AGE,
+            conn_health_checks=True,
+            disable_server_side_cursors=DATABASE_PGBOUNCER,
+        ),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['backend.db.routers.PrimaryReplicaRouter']
+# Сколько секунд после записи клиент читает из основной БД
+DATABASE_PRIMARY_PIN_SECONDS = int(
+    os.getenv('DATABASE_PRIMARY_PIN_SECONDS', 5)
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
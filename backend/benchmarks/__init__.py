@@ -0,0 +1,10 @@
+"""Бенчмарки API реферальной системы.
+
+Запуск из каталога backend, например::
+
+    python -m benchmarks.asgi_vs_wsgi --users 500 --requests 5000
+
+Набор бенчмарков с сохранением результатов в JSON::
+
+    python -m benchmarks.run api micro --args api "--requests 200"
+"""
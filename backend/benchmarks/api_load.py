@@ -0,0 +1,240 @@
+"""Нагрузочный тест эндпоинтов API при заданной конкурентности.
+
+Заполняет БД синтетическими данными (рефереры с кодами и их рефералы)
+и для каждого сценария выполняет ``--requests`` запросов через
+тестовый клиент Django: WSGI - пулом потоков, ASGI - конкурентными
+корутинами. Сценарии: регистрация по реферальному коду, вход,
+создание и удаление кода, получение кода по email и список
+рефералов. Запросы с неожиданным статусом считаются ошибками.
+
+Кэш - Redis из ``REDIS_URL`` или, без него, локальный in-memory.
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .utils import (
+    Timer, print_summary, seed_referral_tree, setup_django, summarize
+)
+
+
+SCENARIOS = (
+    'register', 'login', 'code_delete', 'code_create', 'get_by_email',
+    'referrals',
+)
+# Пул хеширования паролей переполнен (users.hashing)
+REJECTED_STATUS = 503
+
+
+class Context:
+    """Данные для построения запросов сценариев."""
+
+    def __init__(self, referrers, workers, seed):
+        self.referrers = referrers
+        self.codes = {
+            user.pk: f'code{user.pk}' for user in referrers
+        }
+        # Владельцы кодов для create/delete: свой пользователь
+        # у каждого запроса, иначе запросы конфликтуют между собой
+        self.workers = workers
+        self.random = random.Random(seed)
+        self._numbers = itertools.count()
+        self._lock = threading.Lock()
+
+    def next_number(self):
+        with self._lock:
+            return next(self._numbers)
+
+    def choice(self, items):
+        with self._lock:
+            return self.random.choice(items)
+
+
+def build_request(scenario, context, index):
+    """``(method, path, data, token, expected_status)`` запроса."""
+    if scenario == 'register':
+        number = context.next_number()
+        referrer = context.choice(context.referrers)
+        return 'post', '/api/register/', {
+            'username': f'load{number}',
+            'email': f'load{number}@example.com',
+            'password': 'password123',
+            'referral_code': context.codes[referrer.pk],
+        }, None, 201
+    if scenario == 'login':
+        return 'post', '/api/login/', {
+            'username': context.choice(context.referrers).username,
+            'password': 'password123',
+        }, None, 200
+    if scenario in ('code_delete', 'code_create'):
+        token = context.workers[index % len(context.workers)]
+        if scenario == 'code_delete':
+            return 'delete', '/api/referral_code/', None, token, 204
+        return 'post', '/api/referral_code/', None, token, 201
+    if scenario == 'get_by_email':
+        return 'post', '/api/referral_code/get_by_email/', {
+            'email': context.choice(context.referrers).email,
+        }, None, 200
+    if scenario == 'referrals':
+        referrer = context.choice(context.referrers)
+        return 'get', f'/api/referrals/{referrer.pk}/', None, None, 200
+    raise ValueError(f'Неизвестный сценарий: {scenario}')
+
+
+def get_headers(token):
+    return {'Authorization': f'Bearer {token}'} if token else {}
+
+
+def run_wsgi(requests, concurrency):
+    from django.test import Client
+
+    local = threading.local()
+
+    def call(request):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        method, path, data, token, _ = request
+        start = time.perf_counter()
+        response = getattr(local.client, method)(
+            path, data, content_type='application/json',
+            headers=get_headers(token)
+        )
+        return time.perf_counter() - start, response.status_code
+
+    with Timer() as timer:
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(call, requests))
+    return results, timer.elapsed
+
+
+def run_asgi(requests, concurrency):
+    from django.test import AsyncClient
+
+    async def main():
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(request):
+            method, path, data, token, _ = request
+            async with semaphore:
+                start = time.perf_counter()
+                response = await getattr(client, method)(
+                    path, data, content_type='application/json',
+                    headers=get_headers(token)
+                )
+                return time.perf_counter() - start, response.status_code
+
+        return await asyncio.gather(*(call(request) for request in requests))
+
+    with Timer() as timer:
+        results = asyncio.run(main())
+    return results, timer.elapsed
+
+
+RUNNERS = {
+    'wsgi': run_wsgi,
+    'asgi': run_asgi,
+}
+
+
+def create_workers(count):
+    """Пользователи с токенами для сценариев создания/удаления кода."""
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.utils import timezone
+
+    from referral_system.models import ReferralCode
+    from users.tokens import UserClaimsRefreshToken
+
+    User = get_user_model()
+    password = make_password('password123')
+    User.objects.bulk_create(
+        User(username=f'worker{i}', email=f'worker{i}@example.com',
+             password=password)
+        for i in range(count)
+    )
+    users = list(
+        User.objects.filter(username__startswith='worker').order_by('id')
+    )
+    # Первым выполняется удаление: у каждого пользователя уже есть код
+    expiration_date = timezone.now() + timezone.timedelta(days=7)
+    ReferralCode.objects.bulk_create(
+        ReferralCode(user=user, code=f'worker{user.pk}',
+                     expiration_date=expiration_date)
+        for user in users
+    )
+    return [
+        str(UserClaimsRefreshToken.for_user(user).access_token)
+        for user in users
+    ]
+
+
+def run_scenario(scenario, context, server, requests, concurrency):
+    batch = [
+        build_request(scenario, context, index) for index in range(requests)
+    ]
+    results, elapsed = RUNNERS[server](batch, concurrency)
+    # Отказы 503 (пул хеширования переполнен) - быстрые ответы без
+    # работы эндпоинта: в задержки и пропускную способность не входят
+    served = [
+        latency for latency, status in results
+        if status != REJECTED_STATUS
+    ]
+    summary = summarize(
+        f'{scenario} ({server}, c={concurrency})', served, elapsed
+    )
+    summary['rejected'] = len(results) - len(served)
+    summary['errors'] = sum(
+        status not in (request[-1], REJECTED_STATUS)
+        for request, (_, status) in zip(batch, results)
+    )
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--referrers', type=int, default=200)
+    parser.add_argument('--referrals', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--server', choices=RUNNERS, default='wsgi')
+    parser.add_argument(
+        '--scenarios', default=','.join(SCENARIOS),
+        help='Сценарии через запятую.'
+    )
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+    scenarios = args.scenarios.split(',')
+
+    setup_django()
+    with Timer() as timer:
+        referrers = seed_referral_tree(args.referrers, args.referrals)
+        # Каждый запрос создания/удаления кода - своему пользователю
+        workers = create_workers(args.requests)
+    print(
+        f'Данные: {args.referrers} рефереров по {args.referrals} '
+        f'рефералов, {timer.elapsed:.1f} с'
+    )
+
+    context = Context(referrers, workers, args.seed)
+    results = []
+    for scenario in scenarios:
+        result = run_scenario(
+            scenario, context, args.server, args.requests, args.concurrency
+        )
+        print_summary(result)
+        print(
+            f'{"":<32} ошибок: {result["errors"]}, '
+            f'отказов 503: {result["rejected"]}'
+        )
+        results.append(result)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Сравнение пропускной способности эндпоинтов чтения под WSGI и ASGI.
+
+Запросы выполняются внутри процесса через тестовые клиенты Django:
+WSGI - пулом потоков, ASGI - конкурентными корутинами в одном
+event loop. Сравниваются получение кода по email и список рефералов.
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .utils import (
+    Timer, print_summary, seed_referral_tree, setup_django, summarize
+)
+
+
+def build_requests(referrers, total):
+    requests = []
+    for _ in range(total):
+        user = random.choice(referrers)
+        if random.random() < 0.5:
+            requests.append((
+                'post', '/api/referral_code/get_by_email/',
+                {'email': user.email}
+            ))
+        else:
+            requests.append(('get', f'/api/referrals/{user.pk}/', None))
+    return requests
+
+
+def run_wsgi(requests, concurrency):
+    from django.test import Client
+
+    local = threading.local()
+
+    def call(request):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        method, path, data = request
+        start = time.perf_counter()
+        response = getattr(local.client, method)(path, data)
+        assert response.status_code == 200, response.status_code
+        return time.perf_counter() - start
+
+    with Timer() as timer:
+        with ThreadPoolExecutor(concurrency) as executor:
+            latencies = list(executor.map(call, requests))
+    return summarize(f'wsgi (threads={concurrency})', latencies, timer.elapsed)
+
+
+def run_asgi(requests, concurrency):
+    from django.test import AsyncClient
+
+    async def main():
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(request):
+            method, path, data = request
+            async with semaphore:
+                start = time.perf_counter()
+                response = await getattr(client, method)(path, data)
+                assert response.status_code == 200, response.status_code
+                return time.perf_counter() - start
+
+        return await asyncio.gather(*(call(request) for request in requests))
+
+    with Timer() as timer:
+        latencies = asyncio.run(main())
+    return summarize(
+        f'asgi (coroutines={concurrency})', latencies, timer.elapsed
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--referrals', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    referrers = seed_referral_tree(args.users, args.referrals)
+    requests = build_requests(referrers, args.requests)
+
+    results = [
+        run_wsgi(requests, args.concurrency),
+        run_asgi(requests, args.concurrency),
+    ]
+    for result in results:
+        print_summary(result)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Сравнение двух файлов результатов ``benchmarks.run``.
+
+Для каждого случая, который есть в обоих файлах, выводит
+пропускную способность и p95 и их изменение в процентах::
+
+    python -m benchmarks.compare results/old.json results/new.json
+"""
+
+import argparse
+import json
+
+
+# Метрики пропускной способности (больше - лучше) и задержки
+THROUGHPUT_KEYS = ('throughput_rps', 'ops_per_s', 'logins_per_s')
+LATENCY_KEYS = ('p95_ms', 'p95_us', 'ms_per_login')
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def index_cases(data):
+    """``{(benchmark, case): result}`` из файла результатов."""
+    cases = {}
+    for benchmark, results in data['benchmarks'].items():
+        for result in results or ():
+            cases[benchmark, result['name']] = result
+    return cases
+
+
+def get_value(result, keys):
+    for key in keys:
+        if key in result:
+            return key, result[key]
+    return None, None
+
+
+def format_change(old, new):
+    if not old:
+        return '-'
+    return f'{(new - old) / old * 100:+.1f}%'
+
+
+def compare(old_data, new_data):
+    old_cases = index_cases(old_data)
+    rows = []
+    for case, new in index_cases(new_data).items():
+        old = old_cases.get(case)
+        if old is None:
+            continue
+        row = {'benchmark': case[0], 'name': case[1]}
+        for kind, keys in (
+            ('throughput', THROUGHPUT_KEYS), ('latency', LATENCY_KEYS)
+        ):
+            key, new_value = get_value(new, keys)
+            if key is None or key not in old:
+                continue
+            row[kind] = (key, old[key], new_value)
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('old')
+    parser.add_argument('new')
+    args = parser.parse_args(argv)
+
+    old_data, new_data = load(args.old), load(args.new)
+    for label, data in (('old', old_data), ('new', new_data)):
+        meta = data['meta']
+        print(
+            f'{label}: {meta["started_at"]} commit {meta["commit"]}, '
+            f'{meta["database"]}, redis={meta["redis"]}'
+        )
+    rows = compare(old_data, new_data)
+    for row in rows:
+        parts = []
+        for kind in ('throughput', 'latency'):
+            if kind in row:
+                key, old, new = row[kind]
+                parts.append(
+                    f'{key} {old} -> {new} ({format_change(old, new)})'
+                )
+        print(f'{row["benchmark"]}: {row["name"]:<36} ' + '  '.join(parts))
+    return rows
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Стоимость входа: прежний путь (два запроса и два хеширования) против
+однопроходной проверки в LoginSerializer.
+
+Прежний путь воспроизводит старый LoginSerializer.validate
+(``User.objects.get`` + ``check_password``) и последующий
+``authenticate()`` в LoginView.
+"""
+
+import argparse
+
+from .utils import Timer, setup_django
+
+
+def legacy_login(username, password):
+    from django.contrib.auth import authenticate, get_user_model
+
+    from users import hashing
+
+    user = get_user_model().objects.get(username=username)
+    if not hashing.check_password(user, password):
+        return None
+    return authenticate(username=username, password=password)
+
+
+def single_pass_login(username, password):
+    from api.serializers import LoginSerializer
+
+    serializer = LoginSerializer(
+        data={'username': username, 'password': password}
+    )
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['user']
+
+
+def measure(name, login, logins):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    login('benchmark', 'password123')  # прогрев пула хеширования
+    with CaptureQueriesContext(connection) as queries, Timer() as timer:
+        for _ in range(logins):
+            assert login('benchmark', 'password123') is not None
+    return {
+        'name': name,
+        'logins_per_s': round(logins / timer.elapsed, 2),
+        'ms_per_login': round(timer.elapsed / logins * 1000, 2),
+        'queries_per_login': len(queries) / logins,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+
+    settings.DEBUG = True  # для подсчета запросов
+    get_user_model().objects.create_user(
+        'benchmark', 'benchmark@example.com', 'password123'
+    )
+    results = [
+        measure('legacy (get + authenticate)', legacy_login, args.logins),
+        measure('single pass', single_pass_login, args.logins),
+    ]
+    for result in results:
+        print(
+            '{name:<28} {logins_per_s:>8} logins/s  {ms_per_login:>8} ms  '
+            '{queries_per_login} queries/login'.format(**result)
+        )
+    ratio = results[1]['logins_per_s'] / results[0]['logins_per_s']
+    print(f'Ускорение: x{ratio:.2f}')
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Микробенчмарки горячих функций без HTTP: сериализаторы, проверка
+срока действия кода и подготовка записей кэша.
+
+Каждый случай выполняется ``--rounds`` раундов по ``--number`` вызовов;
+перцентили считаются по среднему времени вызова в раунде. Объекты
+моделей создаются в памяти, к БД обращается только валидация
+регистрации (проверка email).
+"""
+
+import argparse
+import time
+
+from .utils import percentile, setup_django
+
+
+def build_cases(referrals):
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+
+    from api.cache import build_payload, get_timeout, is_payload_expired
+    from api.serializers import (
+        ReferralCodeSerializer, ReferralSerializer, ReferrerStatsSerializer,
+        UserRegistrationSerializer
+    )
+    from referral_system.models import (
+        ReferralCode, ReferralRelationship, ReferrerStats
+    )
+
+    User = get_user_model()
+    now = timezone.now()
+    referrer = User(id=1, username='referrer', email='referrer@example.com')
+    referral_code = ReferralCode(
+        user=referrer, code='code1',
+        expiration_date=now + timezone.timedelta(days=7)
+    )
+    relationships = [
+        ReferralRelationship(
+            id=i, referrer=referrer,
+            referral=User(id=i + 1, username=f'referral{i}',
+                          email=f'referral{i}@example.com')
+        )
+        for i in range(1, referrals + 1)
+    ]
+    stats = ReferrerStats(
+        referrer=referrer, referrals_count=referrals, converted_count=0
+    )
+    payload = build_payload(
+        referral_code.code, referral_code.expiration_date
+    )
+    registration = {
+        'username': 'new_user', 'email': 'new_user@example.com',
+        'password': 'password123',
+    }
+
+    def validate_registration():
+        serializer = UserRegistrationSerializer(data=registration)
+        assert serializer.is_valid(), serializer.errors
+
+    return [
+        ('ReferralCode.is_expired', referral_code.is_expired),
+        (
+            'ReferralCodeSerializer',
+            lambda: ReferralCodeSerializer(referral_code).data
+        ),
+        (
+            f'ReferralSerializer, {referrals} шт.',
+            lambda: ReferralSerializer(relationships, many=True).data
+        ),
+        (
+            'ReferrerStatsSerializer',
+            lambda: ReferrerStatsSerializer(stats).data
+        ),
+        (
+            'cache: build_payload',
+            lambda: build_payload(
+                referral_code.code, referral_code.expiration_date
+            )
+        ),
+        ('cache: is_payload_expired', lambda: is_payload_expired(payload)),
+        ('cache: get_timeout', lambda: get_timeout(payload)),
+        ('UserRegistrationSerializer.is_valid', validate_registration),
+    ]
+
+
+def measure(name, func, rounds, number):
+    func()  # прогрев
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    mean = sum(timings) / len(timings)
+    return {
+        'name': name,
+        'calls': rounds * number,
+        'ops_per_s': round(1 / mean, 1),
+        'mean_us': round(mean * 1e6, 3),
+        'p50_us': round(percentile(timings, 50) * 1e6, 3),
+        'p95_us': round(percentile(timings, 95) * 1e6, 3),
+        'p99_us': round(percentile(timings, 99) * 1e6, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--number', type=int, default=200)
+    parser.add_argument(
+        '--referrals', type=int, default=20,
+        help='Размер списка для ReferralSerializer(many=True).'
+    )
+    args = parser.parse_args(argv)
+
+    setup_django()
+    results = [
+        measure(name, func, args.rounds, args.number)
+        for name, func in build_cases(args.referrals)
+    ]
+    for result in results:
+        print(
+            '{name:<36} {ops_per_s:>12} ops/s  p50 {p50_us:>10} us  '
+            'p95 {p95_us:>10} us  p99 {p99_us:>10} us'.format(**result)
+        )
+    return results
+
+
+if __name__ == '__main__':
+    main()
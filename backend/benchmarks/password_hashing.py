@@ -0,0 +1,86 @@
+"""Пропускная способность проверки паролей (логинов в секунду на ядро).
+
+Для каждого хешера измеряется последовательная проверка пароля в одном
+процессе и параллельная в пуле из ``--workers`` процессов.
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .utils import Timer, setup_django
+
+
+def build_hashers(pbkdf2_iterations, scrypt_work_factor, argon2_time_cost):
+    from django.contrib.auth import hashers
+
+    pbkdf2 = hashers.PBKDF2PasswordHasher()
+    pbkdf2.iterations = pbkdf2_iterations
+    scrypt = hashers.ScryptPasswordHasher()
+    scrypt.work_factor = scrypt_work_factor
+    result = {
+        f'pbkdf2 (iterations={pbkdf2_iterations})': pbkdf2,
+        f'scrypt (n={scrypt_work_factor})': scrypt,
+    }
+    try:
+        import argon2  # noqa: F401
+    except ImportError:
+        return result
+    argon = hashers.Argon2PasswordHasher()
+    argon.time_cost = argon2_time_cost
+    result[f'argon2 (time_cost={argon2_time_cost})'] = argon
+    return result
+
+
+def verify(hasher, encoded):
+    return hasher.verify('password123', encoded)
+
+
+def measure(hasher, logins, workers):
+    encoded = hasher.encode('password123', hasher.salt())
+    with Timer() as serial:
+        for _ in range(logins):
+            verify(hasher, encoded)
+    with ProcessPoolExecutor(workers) as executor:
+        # Прогрев: запуск процессов не входит в замер
+        list(executor.map(verify, [hasher] * workers, [encoded] * workers))
+        with Timer() as pooled:
+            list(executor.map(
+                verify, [hasher] * logins, [encoded] * logins
+            ))
+    return {
+        'serial_logins_per_s': round(logins / serial.elapsed, 1),
+        'pooled_logins_per_s': round(logins / pooled.elapsed, 1),
+        'pooled_logins_per_s_per_core': round(
+            logins / pooled.elapsed / workers, 1
+        ),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--pbkdf2-iterations', type=int, default=600000)
+    parser.add_argument('--scrypt-work-factor', type=int, default=2 ** 14)
+    parser.add_argument('--argon2-time-cost', type=int, default=2)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    hashers = build_hashers(
+        args.pbkdf2_iterations, args.scrypt_work_factor,
+        args.argon2_time_cost
+    )
+    results = {}
+    for name, hasher in hashers.items():
+        results[name] = measure(hasher, args.logins, args.workers)
+        print(
+            f'{name:<32} serial {results[name]["serial_logins_per_s"]:>8}/s  '
+            f'pool({args.workers}) {results[name]["pooled_logins_per_s"]:>8}/s'
+            f'  per core {results[name]["pooled_logins_per_s_per_core"]:>8}/s'
+        )
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Генерация реферальных кодов: коды в секунду и доля коллизий.
+
+Сравнивает генератор ``referral_system.codes`` с прежней схемой
+``str(uuid.uuid4())[:20]``, а также создание кодов в БД из пула
+и без него.
+"""
+
+import argparse
+import uuid
+
+from .utils import Timer, setup_django
+
+
+def measure_generator(name, generate, count):
+    with Timer() as timer:
+        codes = [generate() for _ in range(count)]
+    collisions = count - len(set(codes))
+    return {
+        'name': name,
+        'codes_per_s': round(count / timer.elapsed),
+        'collisions': collisions,
+        'collision_rate': collisions / count,
+    }
+
+
+def expected_collisions(count, alphabet_size, length):
+    """Ожидаемое число коллизий (парадокс дней рождения)."""
+    return count * (count - 1) / (2 * alphabet_size ** length)
+
+
+def measure_db(name, count, use_pool):
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+
+    from referral_system.codes import (
+        create_referral_code, fill_reserved_codes
+    )
+    from referral_system.models import ReferralCode, ReservedReferralCode
+
+    User = get_user_model()
+    ReferralCode.objects.all().delete()
+    ReservedReferralCode.objects.all().delete()
+    User.objects.all().delete()
+    User.objects.bulk_create(
+        User(username=f'user{i}', email=f'user{i}@example.com')
+        for i in range(count)
+    )
+    user_ids = list(User.objects.values_list('id', flat=True))
+    if use_pool:
+        fill_reserved_codes(count)
+    expiration_date = timezone.now() + timezone.timedelta(days=7)
+    with Timer() as timer:
+        for user_id in user_ids:
+            create_referral_code(user_id, expiration_date)
+    return {
+        'name': name,
+        'codes_per_s': round(count / timer.elapsed),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=1_000_000)
+    parser.add_argument('--db-count', type=int, default=2000)
+    parser.add_argument(
+        '--short-length', type=int, default=5,
+        help='Длина короткого кода для демонстрации коллизий.'
+    )
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from referral_system.codes import generate_code, get_alphabet, get_length
+
+    alphabet = get_alphabet()
+    generators = [
+        (f'secrets, length={get_length()}', generate_code),
+        (
+            f'secrets, length={args.short_length}',
+            lambda: generate_code(length=args.short_length)
+        ),
+        ('uuid4()[:20] (прежняя схема)', lambda: str(uuid.uuid4())[:20]),
+    ]
+    for name, generate in generators:
+        result = measure_generator(name, generate, args.count)
+        print(
+            '{name:<32} {codes_per_s:>10} codes/s  '
+            'collisions {collisions} ({collision_rate:.2e})'.format(**result)
+        )
+    for length in (get_length(), args.short_length):
+        print(
+            f'Ожидаемые коллизии, length={length}: '
+            f'{expected_collisions(args.count, len(alphabet), length):.3g}'
+        )
+    for name, use_pool in (('db, генерация', False), ('db, из пула', True)):
+        result = measure_db(name, args.db_count, use_pool)
+        print('{name:<32} {codes_per_s:>10} codes/s'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
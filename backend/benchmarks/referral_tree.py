@@ -0,0 +1,274 @@
+"""Цепочки рефералов: рекурсивный CTE против материализованного пути.
+
+Строит синтетическое дерево (по умолчанию 1 000 000 пользователей):
+реферер каждого нового пользователя выбирается случайно среди уже
+зарегистрированных, часть пользователей - корни без реферера. Затем
+для случайной выборки пользователей сравнивает:
+
+- downline: все потомки до глубины ``--max-depth`` рекурсивным CTE
+  (запрос на каждый уровень внутри БД) и одним диапазоном по индексу
+  путей (``referral_system.tree``);
+- upline: предки рекурсивным CTE и чтением пути по ``referral_id``
+  с последующим ``id IN (...)``.
+
+Оба варианта выполняют SQL через один и тот же курсор, без создания
+объектов моделей.
+"""
+
+import argparse
+import random
+from functools import partial
+
+from .utils import Timer, print_summary, setup_django, summarize
+
+
+DOWNLINE_CTE_SQL = '''
+    WITH RECURSIVE tree (referral_id, depth) AS (
+        SELECT referral_id, 1
+        FROM {relationship}
+        WHERE referrer_id = %s
+        UNION ALL
+        SELECT r.referral_id, t.depth + 1
+        FROM {relationship} r
+        JOIN tree t ON r.referrer_id = t.referral_id
+        WHERE t.depth < %s
+    )
+    SELECT u.id, u.username FROM tree t JOIN {user} u ON u.id = t.referral_id
+'''
+
+UPLINE_CTE_SQL = '''
+    WITH RECURSIVE tree (referrer_id, depth) AS (
+        SELECT referrer_id, 1
+        FROM {relationship}
+        WHERE referral_id = %s
+        UNION ALL
+        SELECT r.referrer_id, t.depth + 1
+        FROM {relationship} r
+        JOIN tree t ON r.referral_id = t.referrer_id
+        WHERE t.depth < %s
+    )
+    SELECT u.id, u.username FROM tree t JOIN {user} u ON u.id = t.referrer_id
+'''
+
+DOWNLINE_SIZE_CTE_SQL = '''
+    WITH RECURSIVE tree (referral_id, depth) AS (
+        SELECT referral_id, 1
+        FROM {relationship}
+        WHERE referrer_id = %s
+        UNION ALL
+        SELECT r.referral_id, t.depth + 1
+        FROM {relationship} r
+        JOIN tree t ON r.referrer_id = t.referral_id
+        WHERE t.depth < %s
+    )
+    SELECT COUNT(*) FROM tree
+'''
+
+BATCH_SIZE = 10_000
+
+
+def seed_tree(users, root_share, seed):
+    """Создает дерево с заполненными путями, возвращает id рефереров."""
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.db import transaction
+
+    from referral_system.constants import (
+        MAX_REFERRAL_DEPTH, REFERRAL_PATH_SEGMENT_WIDTH
+    )
+    from referral_system.models import ReferralRelationship
+    from referral_system.tree import encode
+
+    User = get_user_model()
+    rng = random.Random(seed)
+    password = make_password('password123')
+    # paths[i] - путь пользователя с id = i + 1
+    paths = []
+    referrers = set()
+    for start in range(0, users, BATCH_SIZE):
+        batch_users = []
+        relationships = []
+        for index in range(start, min(start + BATCH_SIZE, users)):
+            user_id = index + 1
+            batch_users.append(User(
+                id=user_id, username=f'tree{user_id}',
+                email=f'tree{user_id}@example.com', password=password
+            ))
+            parent = rng.randrange(index) if index else None
+            if (parent is None or rng.random() < root_share
+                    or len(paths[parent]) // REFERRAL_PATH_SEGMENT_WIDTH
+                    > MAX_REFERRAL_DEPTH):
+                paths.append(encode(user_id))
+                continue
+            path = paths[parent] + encode(user_id)
+            paths.append(path)
+            referrers.add(parent + 1)
+            relationships.append(ReferralRelationship(
+                referrer_id=parent + 1, referral_id=user_id,
+                path=path,
+                depth=len(path) // REFERRAL_PATH_SEGMENT_WIDTH - 1
+            ))
+        with transaction.atomic():
+            User.objects.bulk_create(batch_users)
+            ReferralRelationship.objects.bulk_create(relationships)
+    return sorted(referrers)
+
+
+def execute(sql, params):
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def run_cte(sql, user_id, max_depth):
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+
+    from referral_system.models import ReferralRelationship
+
+    sql = sql.format(
+        relationship=connection.ops.quote_name(
+            ReferralRelationship._meta.db_table
+        ),
+        user=connection.ops.quote_name(get_user_model()._meta.db_table),
+    )
+    return execute(sql, [user_id, max_depth])
+
+
+def run_queryset(queryset):
+    # SQL запросов tree без создания объектов моделей: сравниваются
+    # запросы, а не накладные расходы ORM
+    return execute(*queryset.query.sql_with_params())
+
+
+def get_path(user_id):
+    from referral_system.models import ReferralRelationship
+    from referral_system.tree import encode
+
+    rows = run_queryset(
+        ReferralRelationship.objects.filter(referral_id=user_id)
+        .values_list('path')
+    )
+    return rows[0][0] if rows else encode(user_id)
+
+
+def get_downline(user_id, max_depth):
+    from referral_system.models import ReferralRelationship
+    from referral_system.tree import filter_downline
+
+    return filter_downline(
+        ReferralRelationship.objects.all(), get_path(user_id), max_depth
+    )
+
+
+def downline_by_path(user_id, max_depth):
+    return run_queryset(
+        get_downline(user_id, max_depth)
+        .values_list('referral_id', 'referral__username')
+    )
+
+
+def downline_size_by_cte(user_id, max_depth):
+    return run_cte(DOWNLINE_SIZE_CTE_SQL, user_id, max_depth)
+
+
+def downline_size_by_path(user_id, max_depth):
+    # Только поля индекса (path, depth): чтение без обращения к таблице
+    sql, params = (
+        get_downline(user_id, max_depth).values_list('depth')
+        .query.sql_with_params()
+    )
+    return execute(f'SELECT COUNT(*) FROM ({sql}) downline', params)
+
+
+def upline_by_path(user_id, max_depth):
+    from django.contrib.auth import get_user_model
+
+    from referral_system.models import ReferralRelationship
+    from referral_system.tree import decode
+
+    rows = run_queryset(
+        ReferralRelationship.objects.filter(referral_id=user_id)
+        .values_list('path')
+    )
+    if not rows:
+        return []
+    ancestors = decode(rows[0][0])[-2::-1][:max_depth]
+    return run_queryset(
+        get_user_model().objects.filter(id__in=ancestors)
+        .values_list('id', 'username')
+    )
+
+
+def measure(name, query, sample, max_depth):
+    latencies = []
+    rows = 0
+    with Timer() as total:
+        for user_id in sample:
+            with Timer() as timer:
+                rows += len(query(user_id, max_depth))
+            latencies.append(timer.elapsed)
+    summary = summarize(name, latencies, total.elapsed)
+    summary['rows'] = rows
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--samples', type=int, default=200)
+    parser.add_argument('--max-depth', type=int, default=10)
+    parser.add_argument(
+        '--root-share', type=float, default=0.01,
+        help='Доля пользователей без реферера.'
+    )
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    with Timer() as timer:
+        referrers = seed_tree(args.users, args.root_share, args.seed)
+    print(f'Дерево из {args.users} пользователей: {timer.elapsed:.1f} с')
+
+    rng = random.Random(args.seed)
+    samples = {
+        # Потомки есть только у рефереров; у первых пользователей
+        # (самых старых рефереров) поддеревья самые большие
+        'downline': rng.sample(referrers, min(args.samples, len(referrers))),
+        'downline, крупные': referrers[:args.samples],
+        'upline': [rng.randint(1, args.users) for _ in range(args.samples)],
+    }
+    for user_id in samples['downline'][:10]:
+        assert (
+            sorted(run_cte(DOWNLINE_CTE_SQL, user_id, args.max_depth))
+            == sorted(downline_by_path(user_id, args.max_depth))
+        )
+    cases = [
+        ('downline', 'рекурсивный CTE', partial(run_cte, DOWNLINE_CTE_SQL)),
+        ('downline', 'диапазон путей', downline_by_path),
+        (
+            'downline, крупные', 'рекурсивный CTE',
+            partial(run_cte, DOWNLINE_CTE_SQL)
+        ),
+        ('downline, крупные', 'диапазон путей', downline_by_path),
+        ('downline, крупные', 'COUNT, CTE', downline_size_by_cte),
+        ('downline, крупные', 'COUNT, путей', downline_size_by_path),
+        ('upline', 'рекурсивный CTE', partial(run_cte, UPLINE_CTE_SQL)),
+        ('upline', 'путь + id IN', upline_by_path),
+    ]
+    results = [
+        measure(
+            f'{sample}: {name}', query, samples[sample], args.max_depth
+        )
+        for sample, name, query in cases
+    ]
+    for result in results:
+        print_summary(result)
+        print(f'{"":<32} строк: {result["rows"]}')
+    return results
+
+
+if __name__ == '__main__':
+    main()
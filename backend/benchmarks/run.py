@@ -0,0 +1,115 @@
+"""Запуск набора бенчмарков с сохранением результатов в JSON.
+
+По умолчанию выполняет нагрузочный тест API (``api``) и микробенчмарки
+(``micro``). Аргументы отдельного бенчмарка передаются через
+``--args``::
+
+    python -m benchmarks.run api micro --args api "--requests 200"
+
+Результаты с описанием окружения (коммит, версии, БД, кэш)
+сохраняются в ``--output``; два файла сравнивает
+``benchmarks.compare``.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import shlex
+import subprocess
+from datetime import datetime, timezone
+
+
+BENCHMARKS = {
+    'api': 'api_load',
+    'micro': 'micro',
+    'asgi_vs_wsgi': 'asgi_vs_wsgi',
+    'login': 'login',
+    'password_hashing': 'password_hashing',
+    'referral_codes': 'referral_codes',
+    'referral_tree': 'referral_tree',
+    'serialization': 'serialization',
+    'write_concurrency': 'write_concurrency',
+}
+DEFAULT_BENCHMARKS = ('api', 'micro')
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_meta(started_at):
+    import django
+    from django.conf import settings
+
+    return {
+        'started_at': started_at.isoformat(),
+        'commit': get_commit(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'database': settings.BENCHMARK_DATABASE,
+        'redis': bool(settings.REDIS_URL),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        'benchmarks', nargs='*', metavar='BENCHMARK',
+        help=f'{", ".join(BENCHMARKS)}; по умолчанию: api micro.'
+    )
+    parser.add_argument(
+        '--args', nargs=2, action='append', default=[],
+        metavar=('BENCHMARK', 'ARGS'),
+        help='Аргументы бенчмарка одной строкой.'
+    )
+    parser.add_argument(
+        '--output',
+        help='Файл результатов (по умолчанию results/<время>.json).'
+    )
+    args = parser.parse_args(argv)
+    benchmarks = args.benchmarks or DEFAULT_BENCHMARKS
+    unknown = set(benchmarks).difference(BENCHMARKS)
+    if unknown:
+        parser.error(f'неизвестные бенчмарки: {", ".join(sorted(unknown))}')
+    benchmark_args = {
+        name: shlex.split(value) for name, value in args.args
+    }
+
+    started_at = datetime.now(timezone.utc)
+    results = {}
+    for name in benchmarks:
+        print(f'== {name}')
+        module = importlib.import_module(
+            f'{__package__}.{BENCHMARKS[name]}'
+        )
+        results[name] = module.main(benchmark_args.get(name, []))
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, started_at.strftime('%Y%m%dT%H%M%SZ') + '.json'
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(
+            {'meta': get_meta(started_at), 'benchmarks': results}, file,
+            ensure_ascii=False, indent=2
+        )
+    print(f'Результаты: {output}')
+    return output
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""Сериализация ответов: ModelSerializer + JSONRenderer против строк
+values() + FastJSONRenderer.
+
+Сравнивает число сериализаций в секунду для:
+
+- страницы рефералов (``--page-size`` строк) и рейтинга рефереров -
+  только построение тела ответа из уже загруженных данных и вместе
+  с запросом к БД (модели с select_related против values());
+- ответа с реферальным кодом: сериализатор и рендеринг против
+  готового тела из записи кэша.
+"""
+
+import argparse
+import time
+
+from .utils import setup_django
+
+
+def seed(count):
+    """Реферер с ``count`` рефералами и ``count`` рефереров в рейтинге."""
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+
+    from referral_system.models import ReferralRelationship, ReferrerStats
+    from referral_system.tree import build_relationship
+
+    User = get_user_model()
+    password = make_password('password123')
+    referrer = User.objects.create(
+        username='referrer', email='referrer@example.com', password=password
+    )
+    User.objects.bulk_create(
+        User(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com',
+             password=password)
+        for prefix in ('referral', 'leader') for i in range(count)
+    )
+    ReferralRelationship.objects.bulk_create(
+        build_relationship(referrer.pk, referral_id)
+        for referral_id in User.objects.filter(
+            username__startswith='referral'
+        ).exclude(pk=referrer.pk).values_list('id', flat=True)
+    )
+    ReferrerStats.objects.bulk_create(
+        ReferrerStats(referrer=user, referrals_count=1)
+        for user in User.objects.filter(username__startswith='leader')
+    )
+    return referrer
+
+
+def build_cases(referrer, page_size):
+    from django.utils import timezone
+    from rest_framework.renderers import JSONRenderer
+
+    from api.cache import build_payload, get_code_data
+    from api.renderers import FastJSONRenderer
+    from api.serializers import (
+        REFERRAL_VALUES, REFERRER_STATS_FIELDS, REFERRER_STATS_VALUES,
+        PublicReferralCodeSerializer, ReferralSerializer,
+        ReferrerStatsSerializer
+    )
+    from referral_system.analytics import get_leaderboard
+    from referral_system.models import ReferralCode, ReferralRelationship
+
+    json_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+    referrals = ReferralRelationship.objects.filter(
+        referrer_id=referrer.pk
+    ).order_by('id')
+
+    def referral_models():
+        return list(
+            referrals.select_related('referral')
+            .only('id', 'referral__username', 'referral__email')
+            [:page_size]
+        )
+
+    def referral_rows():
+        rows = list(referrals.values('id', **REFERRAL_VALUES)[:page_size])
+        for row in rows:
+            del row['id']
+        return rows
+
+    def leader_models():
+        return list(get_leaderboard(page_size))
+
+    def leader_rows():
+        return list(get_leaderboard(page_size).values(
+            *REFERRER_STATS_FIELDS, **REFERRER_STATS_VALUES
+        ))
+
+    models, rows = referral_models(), referral_rows()
+    leaders, leader_values = leader_models(), leader_rows()
+    referral_code = ReferralCode(
+        user=referrer, code='code1',
+        expiration_date=timezone.now() + timezone.timedelta(days=7)
+    )
+    payload = build_payload(referral_code.code, referral_code.expiration_date)
+
+    def serialize_referrals(page):
+        return json_renderer.render(ReferralSerializer(page, many=True).data)
+
+    def serialize_leaders(page):
+        return json_renderer.render(
+            ReferrerStatsSerializer(page, many=True).data
+        )
+
+    old_referrals = 'ReferralSerializer + JSONRenderer'
+    old_leaders = 'ReferrerStatsSerializer + JSONRenderer'
+    new = 'values + FastJSONRenderer'
+    return [
+        (f'рефералы, {page_size} шт.', [
+            (old_referrals, lambda: serialize_referrals(models)),
+            (new, lambda: fast_renderer.render(rows)),
+        ]),
+        (f'рефералы, {page_size} шт., с БД', [
+            (old_referrals, lambda: serialize_referrals(referral_models())),
+            (new, lambda: fast_renderer.render(referral_rows())),
+        ]),
+        ('рейтинг', [
+            (old_leaders, lambda: serialize_leaders(leaders)),
+            (new, lambda: fast_renderer.render(leader_values)),
+        ]),
+        ('рейтинг, с БД', [
+            (old_leaders, lambda: serialize_leaders(leader_models())),
+            (new, lambda: fast_renderer.render(leader_rows())),
+        ]),
+        ('код по email', [
+            (
+                'PublicReferralCodeSerializer + JSONRenderer',
+                lambda: json_renderer.render(
+                    PublicReferralCodeSerializer(referral_code).data
+                )
+            ),
+            (
+                'FastJSONRenderer из записи кэша',
+                lambda: fast_renderer.render(get_code_data(payload))
+            ),
+            ('готовое тело из кэша', lambda: payload['body']),
+        ]),
+    ]
+
+
+def measure(case, name, func, duration):
+    func()  # прогрев
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + duration
+    while time.perf_counter() < deadline:
+        func()
+        calls += 1
+    elapsed = time.perf_counter() - start
+    return {
+        'name': f'{case}: {name}',
+        'ops_per_s': round(calls / elapsed, 1),
+        'mean_us': round(elapsed / calls * 1e6, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument(
+        '--duration', type=float, default=1.0,
+        help='Секунд на каждый вариант.'
+    )
+    args = parser.parse_args(argv)
+
+    setup_django()
+    referrer = seed(args.page_size)
+    results = []
+    for case, variants in build_cases(referrer, args.page_size):
+        case_results = [
+            measure(case, name, func, args.duration)
+            for name, func in variants
+        ]
+        baseline = case_results[0]['ops_per_s']
+        for result in case_results:
+            result['speedup'] = round(result['ops_per_s'] / baseline, 2)
+            print(
+                '{name:<64} {ops_per_s:>12} ops/s  {mean_us:>10} us  '
+                'x{speedup}'.format(**result)
+            )
+        results.extend(case_results)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Настройки для бенчмарков: отдельная временная БД.
+
+``BENCHMARK_DATABASE`` выбирает БД: ``sqlite`` (WAL, по умолчанию),
+``sqlite-legacy`` (SQLite с настройками Django по умолчанию) или
+URL PostgreSQL (``postgres://...``).
+"""
+
+import os
+import tempfile
+
+from backend.db.config import parse_database_url, sqlite_config
+from backend.settings import *  # noqa: F401,F403
+
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+# Нагрузка идет с одного IP: лимиты запросов отключены
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,  # noqa: F405
+    'DEFAULT_THROTTLE_RATES': dict.fromkeys(
+        REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']  # noqa: F405
+    ),
+}
+
+# Очередь пула хеширования паролей не ограничена: иначе при
+# конкурентности больше размера очереди регистрация и вход меряют
+# быстрые отказы 503, а не эндпоинты
+PASSWORD_HASHING_MAX_PENDING = int(
+    os.getenv('PASSWORD_HASHING_MAX_PENDING', 10 ** 6)
+)
+
+BENCHMARK_DB = os.getenv(
+    'BENCHMARK_DB',
+    os.path.join(tempfile.gettempdir(), 'referral_benchmark.sqlite3')
+)
+BENCHMARK_DATABASE = os.getenv('BENCHMARK_DATABASE', 'sqlite')
+
+if BENCHMARK_DATABASE == 'sqlite':
+    DATABASES = {'default': sqlite_config(BENCHMARK_DB)}
+elif BENCHMARK_DATABASE == 'sqlite-legacy':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BENCHMARK_DB,
+        }
+    }
+else:
+    DATABASES = {
+        'default': parse_database_url(
+            BENCHMARK_DATABASE, conn_max_age=None, conn_health_checks=True
+        )
+    }
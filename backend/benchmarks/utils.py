@@ -0,0 +1,116 @@
+import os
+import statistics
+import time
+
+
+def setup_django(settings_module='benchmarks.settings'):
+    """Настраивает Django и создает чистую схему БД для бенчмарка."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connections
+
+    # Несколько бенчмарков в одном процессе: БД пересоздается
+    connections.close_all()
+    is_sqlite = settings.DATABASES['default']['ENGINE'].endswith('sqlite3')
+    if is_sqlite:
+        db_name = str(settings.DATABASES['default']['NAME'])
+        for path in (db_name, db_name + '-wal', db_name + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+    call_command('migrate', verbosity=0)
+    if not is_sqlite:
+        call_command('flush', interactive=False, verbosity=0)
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def summarize(name, latencies, elapsed):
+    """Сводка: пропускная способность и перцентили задержек, мс."""
+    mean = statistics.fmean(latencies) if latencies else 0.0
+    return {
+        'name': name,
+        'requests': len(latencies),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'mean_ms': round(mean * 1000, 3),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def print_summary(summary):
+    print(
+        '{name:<32} {requests:>7} req  {throughput_rps:>9} req/s  '
+        'p50 {p50_ms:>8} ms  p95 {p95_ms:>8} ms  p99 {p99_ms:>8} ms'
+        .format(**summary)
+    )
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def seed_referral_tree(referrers, referrals_per_referrer):
+    """Создает рефереров с активными кодами и их рефералов.
+
+    Пароль у всех пользователей - ``password123``.
+    """
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.utils import timezone
+
+    from referral_system.models import ReferralCode, ReferralRelationship
+    from referral_system.tree import build_relationship, encode
+
+    User = get_user_model()
+    password = make_password('password123')
+    expiration_date = timezone.now() + timezone.timedelta(days=7)
+
+    User.objects.bulk_create(
+        User(username=f'referrer{i}', email=f'referrer{i}@example.com',
+             password=password)
+        for i in range(referrers)
+    )
+    referrer_users = list(
+        User.objects.filter(username__startswith='referrer').order_by('id')
+    )
+    ReferralCode.objects.bulk_create(
+        ReferralCode(user=user, code=f'code{user.pk}',
+                     expiration_date=expiration_date)
+        for user in referrer_users
+    )
+    User.objects.bulk_create(
+        User(username=f'referral{user.pk}_{i}',
+             email=f'referral{user.pk}_{i}@example.com', password=password)
+        for user in referrer_users for i in range(referrals_per_referrer)
+    )
+    referral_ids = dict(
+        User.objects.filter(username__startswith='referral')
+        .exclude(username__startswith='referrer')
+        .values_list('username', 'id')
+    )
+    # Рефереры - корни дерева, их рефералы - первый уровень
+    ReferralRelationship.objects.bulk_create(
+        build_relationship(
+            user.pk, referral_ids[f'referral{user.pk}_{i}'],
+            referrer_path=encode(user.pk)
+        )
+        for user in referrer_users for i in range(referrals_per_referrer)
+    )
+    return referrer_users
@@ -0,0 +1,136 @@
+"""Конкурентная запись: несколько процессов-воркеров одновременно
+регистрируют пользователей с реферальным кодом реферера.
+
+Каждая операция - транзакция, как при регистрации: пользователь,
+его реферальный код и связь с реферером. Каждый режим БД запускается
+в отдельном процессе (``BENCHMARK_DATABASE``): ``sqlite-legacy``
+(настройки Django по умолчанию), ``sqlite`` (WAL, busy_timeout,
+BEGIN IMMEDIATE) и PostgreSQL, если передан ``--database-url``.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+from .utils import print_summary, setup_django, summarize
+
+
+def write_user(worker, index, password, referrer_id, expiration_date):
+    from django.contrib.auth import get_user_model
+    from django.db import transaction
+
+    from referral_system.models import ReferralCode, ReferralRelationship
+
+    with transaction.atomic():
+        user = get_user_model().objects.create(
+            username=f'writer{worker}_{index}',
+            email=f'writer{worker}_{index}@example.com',
+            password=password,
+        )
+        ReferralCode.objects.create(
+            user=user, code=f'w{worker}_{index}',
+            expiration_date=expiration_date
+        )
+        ReferralRelationship.objects.create(
+            referrer_id=referrer_id, referral=user
+        )
+
+
+def run_worker(args):
+    worker, writes, password, referrer_id, expiration_date = args
+    from django.db import OperationalError, connection
+
+    latencies = []
+    errors = 0
+    for index in range(writes):
+        start = time.perf_counter()
+        try:
+            write_user(worker, index, password, referrer_id, expiration_date)
+        except OperationalError:
+            # "database is locked": запись не дождалась блокировки
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+    return latencies, errors
+
+
+def run_mode(workers, writes):
+    """Бенчмарк в текущем процессе для БД из настроек."""
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.db import connections
+    from django.utils import timezone
+
+    password = make_password('password123')
+    referrer = get_user_model().objects.create(
+        username='referrer', email='referrer@example.com', password=password
+    )
+    expiration_date = timezone.now() + timezone.timedelta(days=7)
+    # Соединения не должны наследоваться дочерними процессами
+    connections.close_all()
+
+    tasks = [
+        (worker, writes, password, referrer.pk, expiration_date)
+        for worker in range(workers)
+    ]
+    context = multiprocessing.get_context('fork')
+    start = time.perf_counter()
+    with context.Pool(workers) as pool:
+        results = pool.map(run_worker, tasks)
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for result, _ in results for latency in result]
+    summary = summarize(
+        f'{settings.BENCHMARK_DATABASE.split(":")[0]} '
+        f'(workers={workers})',
+        latencies, elapsed
+    )
+    summary['errors'] = sum(errors for _, errors in results)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=200)
+    parser.add_argument(
+        '--database-url',
+        help='URL PostgreSQL для сравнения (postgres://...).'
+    )
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.mode:
+        os.environ['BENCHMARK_DATABASE'] = args.mode
+        print(json.dumps(run_mode(args.workers, args.writes)))
+        return None
+
+    modes = ['sqlite-legacy', 'sqlite']
+    if args.database_url:
+        modes.append(args.database_url)
+    results = []
+    for mode in modes:
+        output = subprocess.run(
+            [
+                sys.executable, '-m', 'benchmarks.write_concurrency',
+                '--mode', mode, '--workers', str(args.workers),
+                '--writes', str(args.writes),
+            ],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.splitlines()[-1]))
+    for result in results:
+        print_summary(result)
+        print(f'{"":<32} ошибок записи: {result["errors"]}')
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Счетчики рефералов по реферерам и рейтинг рефереров.
+
+Счетчики ``ReferrerStats`` обновляются в той же транзакции, что и
+создание/удаление ``ReferralRelationship``: сигналами для операций
+через модель и явным вызовом ``record_referrals`` после bulk_create.
+Расхождения (например, после удаления строк в обход ORM) исправляет
+команда ``rebuild_referrer_stats``.
+"""
+
+from collections import Counter
+
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from . import versions
+from .models import ReferralRelationship, ReferrerStats
+
+
+# Прибавить к счетчикам одним запросом, создавая недостающие строки
+INCREMENT_SQL = '''
+    INSERT INTO {stats} (referrer_id, referrals_count, converted_count)
+    VALUES {values}
+    ON CONFLICT (referrer_id) DO UPDATE SET
+        referrals_count = {stats}.referrals_count + EXCLUDED.referrals_count,
+        converted_count = {stats}.converted_count + EXCLUDED.converted_count
+    RETURNING referrer_id, referrals_count
+'''
+
+# Пересчет всех счетчиков одним запросом на стороне БД
+REBUILD_SQL = '''
+    INSERT INTO {stats} (referrer_id, referrals_count, converted_count)
+    SELECT r.referrer_id, COUNT(*), SUM(CASE WHEN EXISTS (
+        SELECT 1 FROM {relationship} c WHERE c.referrer_id = r.referral_id
+    ) THEN 1 ELSE 0 END)
+    FROM {relationship} r
+    GROUP BY r.referrer_id
+'''
+
+
+def get_connection():
+    return connections[router.db_for_write(ReferrerStats)]
+
+
+def increment(connection, deltas):
+    """Прибавляет неотрицательные дельты, возвращает новые referrals_count.
+
+    ``deltas`` - словарь ``{referrer_id: (referrals, converted)}``.
+    """
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        counts = {}
+        for referrer_id, (referrals, converted) in deltas.items():
+            stats, _ = ReferrerStats.objects.select_for_update().get_or_create(
+                referrer_id=referrer_id
+            )
+            stats.referrals_count += referrals
+            stats.converted_count += converted
+            stats.save()
+            counts[referrer_id] = stats.referrals_count
+        return counts
+
+    sql = INCREMENT_SQL.format(
+        stats=connection.ops.quote_name(ReferrerStats._meta.db_table),
+        values=', '.join(['(%s, %s, %s)'] * len(deltas)),
+    )
+    params = [
+        value for referrer_id, (referrals, converted) in deltas.items()
+        for value in (referrer_id, referrals, converted)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return dict(cursor.fetchall())
+
+
+def decrement(connection, deltas):
+    """Вычитает дельты (не ниже нуля), возвращает новые referrals_count."""
+    stats = ReferrerStats.objects.using(connection.alias)
+    for referrer_id, (referrals, converted) in deltas.items():
+        stats.filter(referrer_id=referrer_id).update(
+            referrals_count=Greatest(F('referrals_count') - referrals, 0),
+            converted_count=Greatest(F('converted_count') - converted, 0),
+        )
+    return dict(
+        stats.filter(referrer_id__in=deltas)
+        .values_list('referrer_id', 'referrals_count')
+    )
+
+
+def get_converted(referral_ids, using=None):
+    """Рефералы из ``referral_ids``, у которых есть свои рефералы."""
+    return set(
+        ReferrerStats.objects.using(using)
+        .filter(referrer_id__in=referral_ids, referrals_count__gt=0)
+        .values_list('referrer_id', flat=True)
+    )
+
+
+def record_referrals(pairs, created=True, converted=None):
+    """Учитывает созданные (удаленные) связи ``(referrer_id, referral_id)``.
+
+    Кроме числа рефералов обновляет ``converted_count``: реферал
+    считается конвертированным, если сам привел хотя бы одного реферала,
+    и версии списков рефералов (``versions``).
+
+    ``converted`` - рефералы с рефералами, определенные заранее
+    (``get_converted``): при каскадном удалении пользователя его
+    счетчики удаляются раньше связей.
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return
+    connection = get_connection()
+    apply = increment if created else decrement
+    sign = 1 if created else -1
+
+    with transaction.atomic(using=connection.alias):
+        referrals = Counter(referrer_id for referrer_id, _ in pairs)
+        counts = apply(connection, {
+            referrer_id: (count, 0) for referrer_id, count in referrals.items()
+        })
+
+        conversions = Counter()
+        # Реферер получил первого (потерял последнего) реферала -
+        # меняется счетчик конвертаций его собственного реферера
+        changed = [
+            referrer_id for referrer_id, count in referrals.items()
+            if (counts.get(referrer_id, 0) > 0)
+            != (counts.get(referrer_id, 0) - sign * count > 0)
+        ]
+        if changed:
+            for referrer_id in (
+                ReferralRelationship.objects.using(connection.alias)
+                .filter(referral_id__in=changed)
+                .values_list('referrer_id', flat=True)
+            ):
+                conversions[referrer_id] += 1
+        # Привязан (отвязан) реферал, у которого уже есть свои рефералы
+        referrer_of = {
+            referral_id: referrer_id for referrer_id, referral_id in pairs
+        }
+        if converted is None:
+            converted = get_converted(referrer_of, using=connection.alias)
+        for referral_id in converted & referrer_of.keys():
+            conversions[referrer_of[referral_id]] += 1
+
+        if conversions:
+            apply(connection, {
+                referrer_id: (0, count)
+                for referrer_id, count in conversions.items()
+            })
+
+    # Списки рефералов изменились: новые ETag после фиксации
+    versions.touch(referrals, using=connection.alias)
+
+
+def rebuild_stats():
+    """Пересчитывает все счетчики, возвращает число рефереров."""
+    connection = get_connection()
+    sql = REBUILD_SQL.format(
+        stats=connection.ops.quote_name(ReferrerStats._meta.db_table),
+        relationship=connection.ops.quote_name(
+            ReferralRelationship._meta.db_table
+        ),
+    )
+    with transaction.atomic(using=connection.alias):
+        ReferrerStats.objects.using(connection.alias).all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.rowcount
+
+
+def get_leaderboard(limit):
+    """Топ рефереров по числу рефералов (чтение по индексу рейтинга)."""
+    return (
+        ReferrerStats.objects
+        .filter(referrals_count__gt=0)
+        .select_related('referrer')
+        .only(
+            'referrals_count', 'converted_count', 'referrer__username'
+        )
+        .order_by('-referrals_count', 'referrer_id')[:limit]
+    )
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ReferralSystemConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'referral_system'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,228 @@
+"""Генерация реферальных кодов и пул заранее созданных кодов.
+
+Алфавит и длину можно переопределить в настройках
+``REFERRAL_CODE_ALPHABET`` и ``REFERRAL_CODE_LENGTH``.
+"""
+
+import secrets
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .constants import (
+    MAX_LENGTH_REFERRAL_CODE, REFERRAL_CODE_ALPHABET, REFERRAL_CODE_LENGTH,
+    REFERRAL_CODE_MAX_ATTEMPTS, RESERVED_CODES_BATCH_SIZE
+)
+from .models import ReferralCode, ReservedReferralCode
+
+
+# Забрать один код из пула одним запросом DELETE ... RETURNING
+POP_RESERVED_CODE_SQL = {
+    'postgresql': '''
+        DELETE FROM {table} WHERE id = (
+            SELECT id FROM {table} ORDER BY id
+            LIMIT 1 FOR UPDATE SKIP LOCKED
+        )
+        RETURNING code
+    ''',
+    'sqlite': '''
+        DELETE FROM {table} WHERE id = (
+            SELECT id FROM {table} ORDER BY id LIMIT 1
+        )
+        RETURNING code
+    ''',
+}
+
+# Выдать код пользователю одним запросом: вставка или замена истекшего.
+# Если у пользователя есть активный код, строка не возвращается.
+UPSERT_REFERRAL_CODE_SQL = '''
+    INSERT INTO {table}
+        (user_id, code, expiration_date, created_at, max_uses, uses_count)
+    VALUES (%s, %s, %s, %s, %s, 0)
+    ON CONFLICT (user_id) DO UPDATE SET
+        code = EXCLUDED.code,
+        expiration_date = EXCLUDED.expiration_date,
+        created_at = EXCLUDED.created_at,
+        max_uses = EXCLUDED.max_uses,
+        uses_count = 0
+    WHERE {table}.expiration_date <= EXCLUDED.created_at
+    RETURNING id
+'''
+
+
+class ReferralCodeGenerationError(Exception):
+    """Не удалось подобрать уникальный код за допустимое число попыток."""
+
+
+def get_alphabet():
+    return getattr(settings, 'REFERRAL_CODE_ALPHABET', REFERRAL_CODE_ALPHABET)
+
+
+def get_length():
+    length = getattr(settings, 'REFERRAL_CODE_LENGTH', REFERRAL_CODE_LENGTH)
+    return min(length, MAX_LENGTH_REFERRAL_CODE)
+
+
+def generate_code(length=None, alphabet=None):
+    """Криптостойкий случайный URL-безопасный код.
+
+    Одно равномерное случайное число из ``[0, base ** length)``
+    раскладывается по основанию алфавита.
+    """
+    length = length or get_length()
+    alphabet = alphabet or get_alphabet()
+    base = len(alphabet)
+    number = secrets.randbelow(base ** length)
+    chars = []
+    for _ in range(length):
+        number, index = divmod(number, base)
+        chars.append(alphabet[index])
+    return ''.join(chars)
+
+
+def pop_reserved_code():
+    """Забирает код из пула или возвращает None, если пул пуст."""
+    connection = connections[router.db_for_write(ReservedReferralCode)]
+    sql = POP_RESERVED_CODE_SQL.get(connection.vendor)
+    if sql is None or not connection.features.can_return_columns_from_insert:
+        with transaction.atomic(using=connection.alias):
+            reserved = (
+                ReservedReferralCode.objects.select_for_update(
+                    skip_locked=True
+                ).order_by('id').first()
+            )
+            if reserved is None:
+                return None
+            reserved.delete()
+            return reserved.code
+
+    table = connection.ops.quote_name(ReservedReferralCode._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(table=table))
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def upsert_referral_code(user_id, code, expiration_date, max_uses=None):
+    """Создает код или заменяет истекший, возвращает id или None.
+
+    None означает, что у пользователя уже есть активный код. У нового
+    кода счетчик регистраций начинается с нуля.
+    """
+    now = timezone.now()
+    connection = connections[router.db_for_write(ReferralCode)]
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        with transaction.atomic(using=connection.alias):
+            current = (
+                ReferralCode.objects.select_for_update()
+                .filter(user_id=user_id).first()
+            )
+            if current is not None and not current.is_expired():
+                return None
+            referral_code, _ = ReferralCode.objects.update_or_create(
+                user_id=user_id,
+                defaults={
+                    'code': code, 'expiration_date': expiration_date,
+                    'created_at': now, 'max_uses': max_uses, 'uses_count': 0,
+                }
+            )
+            return referral_code.id
+
+    adapt = connection.ops.adapt_datetimefield_value
+    sql = UPSERT_REFERRAL_CODE_SQL.format(
+        table=connection.ops.quote_name(ReferralCode._meta.db_table)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [
+            user_id, code, adapt(expiration_date), adapt(now), max_uses
+        ])
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def create_referral_code(user_id, expiration_date, max_uses=None):
+    """Выдает код пользователю: из пула, иначе генерирует новый.
+
+    Истекший код заменяется тем же запросом (upsert). Если у пользователя
+    есть активный код, возвращает None. При коллизии кода (IntegrityError
+    по уникальному code) повторяет попытку с новым кодом, не более
+    ``REFERRAL_CODE_MAX_ATTEMPTS`` раз.
+    """
+    reserved = code = pop_reserved_code()
+    for _ in range(REFERRAL_CODE_MAX_ATTEMPTS):
+        if code is None:
+            code = generate_code()
+        connection = connections[router.db_for_write(ReferralCode)]
+        # Вне транзакции одиночный запрос атомарен сам по себе
+        savepoint = (
+            transaction.atomic(using=connection.alias)
+            if connection.in_atomic_block else nullcontext()
+        )
+        try:
+            with savepoint:
+                referral_code_id = upsert_referral_code(
+                    user_id, code, expiration_date, max_uses
+                )
+        except IntegrityError:
+            if not ReferralCode.objects.filter(code=code).exists():
+                # Конфликт не по коду (например, пользователь удален)
+                raise
+            code = None
+            continue
+        if referral_code_id is None:
+            if reserved is not None and code == reserved:
+                # Код из пула не понадобился - возвращаем его обратно
+                ReservedReferralCode.objects.bulk_create(
+                    [ReservedReferralCode(code=code)], ignore_conflicts=True
+                )
+            return None
+        return ReferralCode(
+            id=referral_code_id, user_id=user_id, code=code,
+            expiration_date=expiration_date, max_uses=max_uses
+        )
+    raise ReferralCodeGenerationError(
+        'Не удалось сгенерировать уникальный реферальный код.'
+    )
+
+
+def redeem(referral_code_id, code, count=1, now=None):
+    """Учитывает ``count`` регистраций по коду одним условным UPDATE.
+
+    Возвращает False, если код удален, заменен другим, истек или его
+    лимит не вмещает ``count`` регистраций. Проверка и увеличение
+    счетчика - один запрос, поэтому параллельные регистрации не
+    превышают ``max_uses``; строка кода заблокирована до конца
+    транзакции.
+    """
+    now = now or timezone.now()
+    return bool(
+        ReferralCode.objects
+        .filter(id=referral_code_id, code=code, expiration_date__gte=now)
+        .filter(
+            Q(max_uses__isnull=True)
+            | Q(uses_count__lte=F('max_uses') - count)
+        )
+        .update(uses_count=F('uses_count') + count)
+    )
+
+
+def fill_reserved_codes(target, batch_size=RESERVED_CODES_BATCH_SIZE):
+    """Пополняет пул до ``target`` кодов, возвращает число добавленных."""
+    initial = current = ReservedReferralCode.objects.count()
+    while current < target:
+        codes = {
+            generate_code() for _ in range(min(target - current, batch_size))
+        }
+        codes -= set(
+            ReferralCode.objects.filter(code__in=codes)
+            .values_list('code', flat=True)
+        )
+        ReservedReferralCode.objects.bulk_create(
+            [ReservedReferralCode(code=code) for code in codes],
+            ignore_conflicts=True
+        )
+        current = ReservedReferralCode.objects.count()
+    return current - initial
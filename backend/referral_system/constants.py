@@ -1 +1,26 @@
 MAX_LENGTH_REFERRAL_CODE = 20
+EXPORT_CHUNK_SIZE = 2000  # Строк за одно чтение из курсора при выгрузке
+MAX_REFERRAL_DEPTH = 100  # Максимальная глубина цепочки рефералов
+EXPORT_MAX_DEPTH = MAX_REFERRAL_DEPTH  # Глубина выгрузки дерева рефералов
+REFERRAL_PATH_SEGMENT_WIDTH = 12  # Цифр на id в пути предков (id < 10**12)
+REFERRAL_PATH_MAX_LENGTH = (
+    REFERRAL_PATH_SEGMENT_WIDTH * (MAX_REFERRAL_DEPTH + 1)
+)
+# URL-безопасный алфавит: 62 символа, ~5.95 бит энтропии на символ
+REFERRAL_CODE_ALPHABET = (
+    'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+)
+REFERRAL_CODE_LENGTH = 12  # ~71 бит энтропии
+REFERRAL_CODE_MAX_ATTEMPTS = 5  # Попыток при коллизии кода
+RESERVED_CODES_BATCH_SIZE = 1000  # Кодов в одной вставке в пул
+EXPIRED_CODES_BATCH_SIZE = 1000  # Истекших кодов в одном DELETE
+EXPIRED_CODES_SWEEP_INTERVAL = 60  # Пауза между проходами очистки, сек
+REFERRALS_VERSION_CACHE_KEY = 'referrals_version_{user_id}'
+REFERRALS_VERSION_TIMEOUT = 60 * 60 * 24 * 7  # 7 дней для версии рефералов
+REFERRAL_EVENT_KIND_MAX_LENGTH = 50
+REFERRAL_EVENTS_BATCH_SIZE = 100  # Событий outbox за один захват
+REFERRAL_EVENTS_POLL_INTERVAL = 1  # Пауза воркера при пустом outbox, сек
+REFERRAL_EVENTS_LEASE = 60  # Аренда захваченных событий, сек
+REFERRAL_EVENTS_MAX_ATTEMPTS = 10  # Попыток обработки события
+REFERRAL_EVENTS_RETRY_DELAY = 1  # Пауза перед первым повтором, сек
+REFERRAL_EVENTS_MAX_RETRY_DELAY = 300  # Максимальная пауза перед повтором
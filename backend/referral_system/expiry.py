@@ -0,0 +1,47 @@
+"""Очистка истекших реферальных кодов."""
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import outbox
+from .constants import EXPIRED_CODES_BATCH_SIZE
+from .models import ReferralCode
+
+
+def sweep_expired_codes(batch_size=EXPIRED_CODES_BATCH_SIZE, now=None):
+    """Освобождает истекшие коды пачками по ``batch_size``.
+
+    Строка кода остается со сроком действия и счетчиками регистраций,
+    очищается только сам код: поиск по email и после очистки отвечает,
+    что срок кода истек. Для каждого кода в той же транзакции
+    записывается событие ``REFERRAL_CODE_DELETED``, как при удалении
+    кода владельцем.
+
+    Короткие транзакции не держат блокировки долго. Для каждой пачки
+    возвращает число освобожденных кодов и email их владельцев, чтобы
+    вытеснить записи из кэша.
+    """
+    now = now or timezone.now()
+    expired = (
+        ReferralCode.objects
+        .filter(expiration_date__lte=now, code__isnull=False)
+        .order_by('expiration_date')
+    )
+    while True:
+        with transaction.atomic():
+            # Код мог быть заменен новым после выборки: строки пачки
+            # блокируются до конца транзакции
+            batch = list(
+                expired.select_for_update(of=('self',))
+                .values_list('id', 'user_id', 'user__email')[:batch_size]
+            )
+            if not batch:
+                return
+            ReferralCode.objects.filter(
+                id__in=[referral_code_id for referral_code_id, _, _ in batch]
+            ).update(code=None)
+            outbox.publish_many(outbox.REFERRAL_CODE_DELETED, [
+                {'user_id': user_id, 'email': email}
+                for _, user_id, email in batch
+            ])
+        yield len(batch), [email for _, _, email in batch]
@@ -0,0 +1,84 @@
+"""Потоковая выгрузка дерева рефералов в NDJSON/CSV."""
+
+import csv
+import json
+
+from django.db.models import F
+
+from . import tree
+from .constants import (
+    EXPORT_CHUNK_SIZE, EXPORT_MAX_DEPTH, REFERRAL_PATH_SEGMENT_WIDTH
+)
+from .models import ReferralRelationship
+
+
+EXPORT_FIELDS = (
+    'referrer_id', 'referral_id', 'referral_username', 'referral_email',
+    'depth',
+)
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def get_tree_queryset(referrer_id, max_depth=EXPORT_MAX_DEPTH):
+    """Потомки реферера одним диапазонным чтением по индексу путей.
+
+    Строки идут в порядке путей: каждый реферал сразу за своим
+    реферером (обход в глубину).
+    """
+    path = tree.get_path(referrer_id)
+    base_depth = len(path) // REFERRAL_PATH_SEGMENT_WIDTH - 1
+    return (
+        tree.filter_downline(
+            ReferralRelationship.objects.all(), path, max_depth
+        )
+        .order_by('path')
+        .values_list(
+            'referrer_id', 'referral_id', 'referral__username',
+            'referral__email', F('depth') - base_depth
+        )
+    )
+
+
+def iter_referral_tree(referrer_id, max_depth=EXPORT_MAX_DEPTH,
+                       chunk_size=EXPORT_CHUNK_SIZE):
+    """Обходит всех рефералов реферера до глубины ``max_depth``.
+
+    Строки читаются из курсора порциями по ``chunk_size``, поэтому
+    потребление памяти не зависит от размера дерева.
+    """
+    rows = get_tree_queryset(referrer_id, max_depth)
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield dict(zip(EXPORT_FIELDS, row))
+
+
+class Echo:
+    """Псевдобуфер: csv.writer сразу возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def render_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+RENDERERS = {
+    'ndjson': render_ndjson,
+    'csv': render_csv,
+}
+
+
+def export_referral_tree(referrer_id, export_format='ndjson', **kwargs):
+    """Генератор строк выгрузки в выбранном формате."""
+    return RENDERERS[export_format](iter_referral_tree(referrer_id, **kwargs))
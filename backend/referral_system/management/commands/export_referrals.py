@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from referral_system.constants import EXPORT_CHUNK_SIZE, EXPORT_MAX_DEPTH
+from referral_system.export import EXPORT_FORMATS, export_referral_tree
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Выгружает всех рефералов реферера (рекурсивно) в NDJSON/CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('referrer_id', type=int)
+        parser.add_argument(
+            '--format', dest='export_format', default='ndjson',
+            choices=sorted(EXPORT_FORMATS)
+        )
+        parser.add_argument(
+            '--output', help='Файл для выгрузки (по умолчанию stdout).'
+        )
+        parser.add_argument(
+            '--max-depth', type=int, default=EXPORT_MAX_DEPTH
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        referrer_id = options['referrer_id']
+        if not User.objects.filter(pk=referrer_id).exists():
+            raise CommandError(f'Пользователь {referrer_id} не найден.')
+
+        lines = export_referral_tree(
+            referrer_id,
+            options['export_format'],
+            max_depth=options['max_depth'],
+            chunk_size=options['chunk_size'],
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
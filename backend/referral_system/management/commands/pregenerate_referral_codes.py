@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from referral_system.codes import fill_reserved_codes
+from referral_system.constants import RESERVED_CODES_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Пополняет пул заранее сгенерированных реферальных кодов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'target', type=int, help='Желаемый размер пула.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=RESERVED_CODES_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        added = fill_reserved_codes(
+            options['target'], batch_size=options['batch_size']
+        )
+        self.stdout.write(f'Добавлено кодов в пул: {added}.')
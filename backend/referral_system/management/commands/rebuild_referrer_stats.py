@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from referral_system.analytics import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счетчики рефералов (ReferrerStats) по таблице '
+        'связей одним запросом.'
+    )
+
+    def handle(self, *args, **options):
+        count = rebuild_stats()
+        self.stdout.write(f'Пересчитано рефереров: {count}.')
@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from backend.process import setup_worker
+from referral_system.constants import (
+    REFERRAL_EVENTS_BATCH_SIZE, REFERRAL_EVENTS_POLL_INTERVAL
+)
+from referral_system.outbox import run_worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Обрабатывает события outbox реферальной системы пачками. '
+        'Параллельные воркеры - потоки или процессы (--pool); '
+        'с --once команда завершается, когда события закончились.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Число параллельных воркеров.'
+        )
+        parser.add_argument(
+            '--pool', choices=('thread', 'process'), default='thread',
+            help='Потоки - для обработчиков, ждущих кэш и БД; процессы - '
+                 'для обработчиков, нагружающих CPU.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=REFERRAL_EVENTS_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--interval', type=float, default=REFERRAL_EVENTS_POLL_INTERVAL,
+            help='Пауза при пустом outbox, сек.'
+        )
+        parser.add_argument('--once', action='store_true')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        kwargs = {
+            'batch_size': options['batch_size'],
+            'interval': options['interval'],
+            'once': options['once'],
+        }
+        if options['pool'] == 'process':
+            # Дочерние процессы не должны наследовать соединения с БД
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                max_workers=concurrency, initializer=setup_worker
+            )
+        else:
+            # Остановка потоков по Ctrl+C; процессы получают сигнал сами
+            kwargs['stop'] = threading.Event()
+            executor = ThreadPoolExecutor(max_workers=concurrency)
+
+        with executor:
+            futures = [
+                executor.submit(run_worker, **kwargs)
+                for _ in range(concurrency)
+            ]
+            try:
+                processed = sum(future.result() for future in futures)
+            except KeyboardInterrupt:
+                if 'stop' in kwargs:
+                    kwargs['stop'].set()
+                processed = sum(future.result() for future in futures)
+        self.stdout.write(f'Обработано событий: {processed}.')
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.16 on 2026-10-17 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('referral_system', '0002_referralrelationship'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservedReferralCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, unique=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.16 on 2026-10-17 17:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+from backend.db.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнять в транзакции
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('referral_system', '0003_reservedreferralcode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='referralcode',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='referralrelationship',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        AddIndexConcurrently(
+            model_name='referralcode',
+            index=models.Index(fields=['expiration_date'], name='referral_code_expiration_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='referralrelationship',
+            index=models.Index(fields=['referrer', 'id'], name='referral_referrer_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='referralrelationship',
+            index=models.Index(fields=['referrer', 'created_at'], name='referral_referrer_created_idx'),
+        ),
+        # Одиночный индекс по referrer покрывается составными индексами
+        migrations.AlterField(
+            model_name='referralrelationship',
+            name='referrer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='referrals', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
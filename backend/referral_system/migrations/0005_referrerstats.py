@@ -0,0 +1,41 @@
+# Generated by Django 4.2.16 on 2026-10-17 17:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Начальное заполнение счетчиков по существующим связям
+POPULATE_SQL = '''
+    INSERT INTO referral_system_referrerstats
+        (referrer_id, referrals_count, converted_count)
+    SELECT r.referrer_id, COUNT(*), SUM(CASE WHEN EXISTS (
+        SELECT 1 FROM referral_system_referralrelationship c
+        WHERE c.referrer_id = r.referral_id
+    ) THEN 1 ELSE 0 END)
+    FROM referral_system_referralrelationship r
+    GROUP BY r.referrer_id
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_applicationuser_managers_and_more'),
+        ('referral_system', '0004_referralcode_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferrerStats',
+            fields=[
+                ('referrer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='referral_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('referrals_count', models.PositiveIntegerField(default=0)),
+                ('converted_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-referrals_count', 'referrer'], name='referrer_stats_rank_idx')],
+            },
+        ),
+        migrations.RunSQL(POPULATE_SQL, migrations.RunSQL.noop),
+    ]
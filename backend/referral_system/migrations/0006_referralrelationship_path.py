@@ -0,0 +1,82 @@
+# Generated by Django 4.2.16 on 2026-10-17 17:57
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+from backend.db.operations import AddIndexConcurrently
+
+
+SEGMENT_WIDTH = 12
+BATCH_SIZE = 1000
+
+
+def populate_paths(apps, schema_editor):
+    """Заполняет пути обходом дерева в ширину от корней.
+
+    Связи, образующие цикл, недостижимы от корней и остаются
+    с пустым путем.
+    """
+    ReferralRelationship = apps.get_model(
+        'referral_system', 'ReferralRelationship'
+    )
+    relationships = ReferralRelationship.objects.using(
+        schema_editor.connection.alias
+    )
+    children = defaultdict(list)
+    referrals = set()
+    for pk, referrer_id, referral_id in relationships.values_list(
+        'id', 'referrer_id', 'referral_id'
+    ).iterator():
+        children[referrer_id].append((pk, referral_id))
+        referrals.add(referral_id)
+
+    level = [
+        (str(referrer_id).zfill(SEGMENT_WIDTH), referrer_id)
+        for referrer_id in children if referrer_id not in referrals
+    ]
+    depth = 1
+    while level:
+        updated = []
+        next_level = []
+        for path, referrer_id in level:
+            for pk, referral_id in children.pop(referrer_id, ()):
+                referral_path = path + str(referral_id).zfill(SEGMENT_WIDTH)
+                updated.append(ReferralRelationship(
+                    pk=pk, path=referral_path, depth=depth
+                ))
+                next_level.append((referral_path, referral_id))
+        relationships.bulk_update(
+            updated, ['path', 'depth'], batch_size=BATCH_SIZE
+        )
+        level = next_level
+        depth += 1
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнять в транзакции
+    atomic = False
+
+    dependencies = [
+        ('referral_system', '0005_referrerstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='referralrelationship',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='referralrelationship',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=1212),
+        ),
+        migrations.RunPython(
+            populate_paths, migrations.RunPython.noop, atomic=True
+        ),
+        AddIndexConcurrently(
+            model_name='referralrelationship',
+            index=models.Index(fields=['path', 'depth'], name='referral_path_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.16 on 2026-10-17 18:42
+
+from django.db import migrations, models
+
+
+# Регистрации по текущему коду - рефералы владельца, пришедшие после
+# выдачи кода (прежний код заменяется вместе с created_at)
+POPULATE_SQL = '''
+    UPDATE referral_system_referralcode SET uses_count = (
+        SELECT COUNT(*) FROM referral_system_referralrelationship r
+        WHERE r.referrer_id = referral_system_referralcode.user_id
+        AND r.created_at >= referral_system_referralcode.created_at
+    )
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('referral_system', '0007_referralevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='referralcode',
+            name='max_uses',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='referralcode',
+            name='uses_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(POPULATE_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-17 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('referral_system', '0008_referralcode_max_uses'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='referralcode',
+            name='code',
+            field=models.CharField(max_length=20, null=True, unique=True),
+        ),
+    ]
@@ -2,7 +2,10 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
-from .constants import MAX_LENGTH_REFERRAL_CODE
+from .constants import (
+    MAX_LENGTH_REFERRAL_CODE, REFERRAL_EVENT_KIND_MAX_LENGTH,
+    REFERRAL_PATH_MAX_LENGTH
+)
 
 
 User = get_user_model()
@@ -12,19 +15,109 @@ class ReferralCode(models.Model):
     user = models.OneToOneField(
         User, on_delete=models.CASCADE, related_name='referral_code'
     )
+    # Пустой у истекшего кода после очистки (``expiry``): строка с
+    # сроком действия и счетчиками остается
     code = models.CharField(
-        max_length=MAX_LENGTH_REFERRAL_CODE, unique=True
+        max_length=MAX_LENGTH_REFERRAL_CODE, unique=True, null=True
     )
     expiration_date = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Лимит регистраций по коду (None - без ограничения) и число
+    # регистраций, учитываемое условным UPDATE (``codes.redeem``)
+    max_uses = models.PositiveIntegerField(null=True, blank=True)
+    uses_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('expiration_date',),
+                name='referral_code_expiration_idx'
+            ),
+        )
 
     def is_expired(self):
         return self.expiration_date < timezone.now()
 
 
 class ReferralRelationship(models.Model):
+    # Отдельный индекс по referrer не нужен: его покрывают составные
     referrer = models.ForeignKey(
-        User, on_delete=models.CASCADE, related_name='referrals'
+        User, on_delete=models.CASCADE, related_name='referrals',
+        db_index=False
     )
     referral = models.OneToOneField(
         User, on_delete=models.CASCADE, related_name='referrer'
     )
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Материализованный путь: id предков от корня и самого реферала
+    # (см. ``tree``). Потомки пользователя - диапазон путей по индексу.
+    path = models.CharField(
+        max_length=REFERRAL_PATH_MAX_LENGTH, default='', editable=False
+    )
+    # Уровень реферала от корня дерева (у прямого реферала корня - 1)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('referrer', 'id'), name='referral_referrer_id_idx'
+            ),
+            models.Index(fields=('path', 'depth'), name='referral_path_idx'),
+            models.Index(
+                fields=('referrer', 'created_at'),
+                name='referral_referrer_created_idx'
+            ),
+        )
+
+
+class ReservedReferralCode(models.Model):
+    """Заранее сгенерированный свободный код из пула."""
+
+    code = models.CharField(
+        max_length=MAX_LENGTH_REFERRAL_CODE, unique=True
+    )
+
+
+class ReferrerStats(models.Model):
+    """Денормализованные счетчики реферера (см. ``analytics``)."""
+
+    referrer = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True,
+        related_name='referral_stats'
+    )
+    referrals_count = models.PositiveIntegerField(default=0)
+    # Рефералы, которые сами привели хотя бы одного реферала
+    converted_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = (
+            # Рейтинг рефереров читается по индексу, без GROUP BY
+            models.Index(
+                fields=('-referrals_count', 'referrer'),
+                name='referrer_stats_rank_idx'
+            ),
+        )
+
+
+class ReferralEvent(models.Model):
+    """Событие в outbox: записывается в транзакции изменения (``outbox``)."""
+
+    kind = models.CharField(max_length=REFERRAL_EVENT_KIND_MAX_LENGTH)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Раньше этого времени событие не берется в обработку: аренда
+    # захваченного события или пауза перед повтором после ошибки
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    # Попытки исчерпаны, событие больше не обрабатывается
+    failed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('available_at', 'id'),
+                name='referral_event_available_idx',
+                condition=models.Q(failed_at__isnull=True)
+            ),
+        )
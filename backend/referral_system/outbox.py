@@ -0,0 +1,205 @@
+"""Outbox событий реферальной системы.
+
+Побочные эффекты изменений (запись в кэш, в дальнейшем - награды и
+уведомления) не выполняются в запросе: событие ``ReferralEvent``
+записывается в той же транзакции, что и само изменение, а обработчики
+вызывает воркер (``manage.py run_referral_worker``).
+
+Доставка - не менее одного раза: воркер берет пачку событий в аренду
+на ``REFERRAL_EVENTS_LEASE`` секунд и удаляет их после обработки. Если
+воркер упал, по окончании аренды пачку возьмет другой, поэтому
+обработчики должны быть идемпотентными. Ошибка обработчика откладывает
+событие с экспоненциальной паузой, после ``REFERRAL_EVENTS_MAX_ATTEMPTS``
+попыток событие остается в таблице с ``failed_at``.
+
+С ``REFERRAL_EVENTS_EAGER`` событие записывается сразу в аренду
+процесса, который его создал, и обрабатывается в нем после фиксации
+транзакции. Если процесс упал или обработчик завершился ошибкой,
+событие после аренды или паузы возьмет воркер.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from backend.db.routers import use_primary
+
+from .constants import (
+    REFERRAL_EVENTS_BATCH_SIZE, REFERRAL_EVENTS_LEASE,
+    REFERRAL_EVENTS_MAX_ATTEMPTS, REFERRAL_EVENTS_MAX_RETRY_DELAY,
+    REFERRAL_EVENTS_POLL_INTERVAL, REFERRAL_EVENTS_RETRY_DELAY
+)
+from .models import ReferralEvent
+
+
+logger = logging.getLogger(__name__)
+
+# Виды событий
+USER_REGISTERED = 'user.registered'
+REFERRAL_CODE_CREATED = 'referral_code.created'
+REFERRAL_CODE_DELETED = 'referral_code.deleted'
+
+# {вид события: [обработчики]}
+HANDLERS = defaultdict(list)
+
+
+def handler(*kinds):
+    """Регистрирует обработчик событий ``kinds``.
+
+    Обработчик получает список событий пачки (всех своих видов сразу),
+    чтобы обращаться к кэшу и БД один раз на пачку.
+    """
+    def decorator(func):
+        for kind in kinds:
+            HANDLERS[kind].append(func)
+        return func
+    return decorator
+
+
+def is_eager():
+    return getattr(settings, 'REFERRAL_EVENTS_EAGER', False)
+
+
+def publish(kind, payload, using=None):
+    """Записывает событие в текущей транзакции."""
+    publish_many(kind, [payload], using=using)
+
+
+def publish_many(kind, payloads, using=None):
+    eager = is_eager()
+    lease = {}
+    if eager:
+        # Событие сразу захвачено этим процессом, как в ``claim``
+        lease = {
+            'attempts': 1,
+            'available_at': timezone.now() + timezone.timedelta(
+                seconds=REFERRAL_EVENTS_LEASE
+            ),
+        }
+    events = [
+        ReferralEvent(kind=kind, payload=payload, **lease)
+        for payload in payloads
+    ]
+    if not events:
+        return
+    ReferralEvent.objects.using(using).bulk_create(events)
+    if eager:
+        transaction.on_commit(lambda: process_eager(events), using=using)
+
+
+def process_eager(events):
+    try:
+        with use_primary():
+            process(events)
+    except Exception:
+        # События остались в outbox: их обработает воркер
+        logger.exception('Не удалось обработать события outbox.')
+
+
+def dispatch(events):
+    """Вызывает обработчики, возвращает ``{индекс события: ошибка}``."""
+    handled = defaultdict(list)
+    for index, event in enumerate(events):
+        for func in HANDLERS.get(event.kind, ()):
+            handled[func].append(index)
+    errors = {}
+    for func, indexes in handled.items():
+        try:
+            func([events[index] for index in indexes])
+        except Exception as exc:
+            logger.exception(
+                'Ошибка обработчика событий %s.', func.__qualname__
+            )
+            for index in indexes:
+                errors.setdefault(index, exc)
+    return errors
+
+
+def get_pending_events(now):
+    return (
+        ReferralEvent.objects
+        .filter(failed_at__isnull=True, available_at__lte=now)
+        .order_by('available_at', 'id')
+    )
+
+
+def claim(batch_size=REFERRAL_EVENTS_BATCH_SIZE):
+    """Берет в аренду до ``batch_size`` доступных событий.
+
+    На PostgreSQL параллельные воркеры пропускают чужие строки
+    (SKIP LOCKED), на SQLite захваты выполняются по очереди.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            get_pending_events(now).select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        events = ReferralEvent.objects.filter(id__in=ids)
+        events.update(
+            available_at=now + timezone.timedelta(
+                seconds=REFERRAL_EVENTS_LEASE
+            ),
+            attempts=F('attempts') + 1
+        )
+        return list(events.order_by('id'))
+
+
+def get_retry_delay(attempts):
+    return min(
+        REFERRAL_EVENTS_RETRY_DELAY * 2 ** (attempts - 1),
+        REFERRAL_EVENTS_MAX_RETRY_DELAY
+    )
+
+
+def process(events):
+    """Обрабатывает захваченные события, возвращает число ошибок."""
+    errors = dispatch(events)
+    ReferralEvent.objects.filter(id__in=[
+        event.id for index, event in enumerate(events)
+        if index not in errors
+    ]).delete()
+
+    now = timezone.now()
+    for index, exc in errors.items():
+        event = events[index]
+        failed = event.attempts >= REFERRAL_EVENTS_MAX_ATTEMPTS
+        ReferralEvent.objects.filter(id=event.id).update(
+            available_at=now + timezone.timedelta(
+                seconds=get_retry_delay(event.attempts)
+            ),
+            last_error=repr(exc),
+            failed_at=now if failed else None
+        )
+    return len(errors)
+
+
+def run_worker(batch_size=REFERRAL_EVENTS_BATCH_SIZE,
+               interval=REFERRAL_EVENTS_POLL_INTERVAL, once=False, stop=None):
+    """Цикл воркера, возвращает число успешно обработанных событий.
+
+    С ``once`` завершается, когда доступных событий не осталось.
+    """
+    stop = stop or threading.Event()
+    processed = 0
+    try:
+        with use_primary():
+            while not stop.is_set():
+                events = claim(batch_size)
+                if events:
+                    processed += len(events) - process(events)
+                    continue
+                if once:
+                    break
+                close_old_connections()
+                stop.wait(interval)
+    finally:
+        connections.close_all()
+    return processed
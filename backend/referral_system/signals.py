@@ -0,0 +1,39 @@
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import tree
+from .analytics import get_converted, record_referrals
+from .models import ReferralRelationship
+
+
+@receiver(pre_save, sender=ReferralRelationship)
+def referral_path(sender, instance, raw=False, **kwargs):
+    # Путь заполняется и для связей, созданных в обход tree
+    if not instance.path and not raw:
+        built = tree.build_relationship(
+            instance.referrer_id, instance.referral_id
+        )
+        instance.path, instance.depth = built.path, built.depth
+
+
+@receiver(post_save, sender=ReferralRelationship)
+def referral_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_referrals([(instance.referrer_id, instance.referral_id)])
+
+
+@receiver(pre_delete, sender=ReferralRelationship)
+def referral_deleting(sender, instance, using, **kwargs):
+    # При каскадном удалении пользователя его счетчики удаляются раньше,
+    # чем срабатывает post_delete связи: конверсию запоминаем до удаления
+    instance._converted = get_converted([instance.referral_id], using=using)
+
+
+@receiver(post_delete, sender=ReferralRelationship)
+def referral_deleted(sender, instance, **kwargs):
+    record_referrals(
+        [(instance.referrer_id, instance.referral_id)], created=False,
+        converted=getattr(instance, '_converted', None)
+    )
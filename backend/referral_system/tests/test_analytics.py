@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from referral_system import tree
+from referral_system.analytics import rebuild_stats
+from referral_system.models import ReferralRelationship, ReferrerStats
+
+
+User = get_user_model()
+
+
+def get_stats():
+    return {
+        referrer_id: (referrals_count, converted_count)
+        for referrer_id, referrals_count, converted_count in (
+            ReferrerStats.objects
+            .filter(referrals_count__gt=0)
+            .values_list('referrer_id', 'referrals_count', 'converted_count')
+        )
+    }
+
+
+class RecordReferralsTests(TestCase):
+    """Счетчики после удалений совпадают с полным пересчетом."""
+
+    def setUp(self):
+        self.a, self.b, self.c, self.d = (
+            User.objects.create_user(name, f'{name}@example.com', 'password')
+            for name in 'abcd'
+        )
+        # a <- b <- c, a <- d: реферал b конвертирован
+        for referrer, referral in (
+            (self.a, self.b), (self.b, self.c), (self.a, self.d)
+        ):
+            tree.build_relationship(referrer.pk, referral.pk).save()
+
+    def assert_rebuilt(self):
+        stats = get_stats()
+        rebuild_stats()
+        self.assertEqual(stats, get_stats())
+
+    def test_delete_converted_referral_user(self):
+        self.assertEqual(get_stats()[self.a.pk], (2, 1))
+        self.b.delete()
+        self.assertEqual(get_stats()[self.a.pk], (1, 0))
+        self.assert_rebuilt()
+
+    def test_delete_converted_relationship(self):
+        ReferralRelationship.objects.get(referral=self.b).delete()
+        self.assert_rebuilt()
+
+    def test_delete_last_referral_of_referral(self):
+        self.c.delete()
+        self.assertEqual(get_stats()[self.a.pk], (2, 0))
+        self.assert_rebuilt()
@@ -0,0 +1,155 @@
+"""Цепочки рефералов: материализованный путь предков.
+
+У каждой связи реферер-реферал хранится путь реферала от корня дерева:
+id всех предков и самого реферала, каждый ровно
+``REFERRAL_PATH_SEGMENT_WIDTH`` цифр. Например, путь ``000000000001
+000000000005`` (без пробела) у пользователя 5, приглашенного
+пользователем 1. Отсюда:
+
+- предки (upline) читаются из одной строки по ``referral_id``;
+- потомки (downline) - все пути с префиксом пути пользователя, то есть
+  диапазон ``[prefix, next(prefix))`` по индексу ``(path, depth)``.
+
+Путь состоит только из цифр, поэтому порядок строк совпадает
+при любой сортировке (collation) БД.
+"""
+
+from django.contrib.auth import get_user_model
+
+from .constants import MAX_REFERRAL_DEPTH, REFERRAL_PATH_SEGMENT_WIDTH
+from .models import ReferralRelationship
+
+
+User = get_user_model()
+
+
+class ReferralTreeError(Exception):
+    """Связь нарушает структуру дерева рефералов."""
+
+
+class ReferralCycleError(ReferralTreeError):
+    """Реферал уже является предком реферера."""
+
+
+class ReferralDepthError(ReferralTreeError):
+    """Цепочка рефералов длиннее ``MAX_REFERRAL_DEPTH``."""
+
+
+def encode(user_id):
+    segment = str(user_id).zfill(REFERRAL_PATH_SEGMENT_WIDTH)
+    if len(segment) > REFERRAL_PATH_SEGMENT_WIDTH:
+        raise ValueError(f'id {user_id} не помещается в путь предков.')
+    return segment
+
+
+def decode(path):
+    """Список id в пути: от корня до самого пользователя."""
+    return [
+        int(path[start:start + REFERRAL_PATH_SEGMENT_WIDTH])
+        for start in range(0, len(path), REFERRAL_PATH_SEGMENT_WIDTH)
+    ]
+
+
+def next_prefix(path):
+    """Наименьшая строка больше всех строк с префиксом ``path``.
+
+    ``None``, если такой строки из цифр той же длины нет (путь из девяток).
+    """
+    digits = path.rstrip('9')
+    if not digits:
+        return None
+    return (
+        digits[:-1] + str(int(digits[-1]) + 1)
+        + '0' * (len(path) - len(digits))
+    )
+
+
+def get_paths(user_ids):
+    """Пути пользователей одним запросом: ``{user_id: path}``.
+
+    У пользователя без реферера (корня дерева) путь - его собственный id.
+    """
+    paths = {user_id: encode(user_id) for user_id in user_ids}
+    paths.update(
+        ReferralRelationship.objects
+        .filter(referral_id__in=paths)
+        .exclude(path='')
+        .values_list('referral_id', 'path')
+    )
+    return paths
+
+
+def get_path(user_id):
+    return get_paths([user_id])[user_id]
+
+
+def check_depth(referrer_path):
+    """Уровень нового реферала; ``ReferralDepthError``, если он глубже
+    ``MAX_REFERRAL_DEPTH``."""
+    depth = len(referrer_path) // REFERRAL_PATH_SEGMENT_WIDTH
+    if depth > MAX_REFERRAL_DEPTH:
+        raise ReferralDepthError('Слишком длинная цепочка рефералов.')
+    return depth
+
+
+def build_relationship(referrer_id, referral_id, referrer_path=None):
+    """Несохраненная связь с заполненными путем и уровнем.
+
+    Выбрасывает ``ReferralCycleError``, если реферал - предок реферера
+    (или он сам), и ``ReferralDepthError`` при превышении глубины.
+    """
+    if referrer_path is None:
+        referrer_path = get_path(referrer_id)
+    if referral_id in decode(referrer_path):
+        raise ReferralCycleError(
+            'Пользователь не может стать рефералом своего реферала.'
+        )
+    depth = check_depth(referrer_path)
+    return ReferralRelationship(
+        referrer_id=referrer_id, referral_id=referral_id,
+        path=referrer_path + encode(referral_id), depth=depth
+    )
+
+
+def get_upline_ids(user_id, max_depth=None):
+    """id предков пользователя от ближайшего (реферера) к корню."""
+    path = (
+        ReferralRelationship.objects
+        .filter(referral_id=user_id)
+        .values_list('path', flat=True)
+        .first()
+    )
+    if not path:
+        return []
+    ancestors = decode(path)[-2::-1]
+    return ancestors[:max_depth] if max_depth else ancestors
+
+
+def get_upline(user_id, max_depth=None):
+    """Предки пользователя (от реферера к корню) с уровнем над ним."""
+    ancestors = get_upline_ids(user_id, max_depth)
+    users = User.objects.in_bulk(ancestors)
+    return [
+        (level, users[ancestor_id])
+        for level, ancestor_id in enumerate(ancestors, start=1)
+        if ancestor_id in users
+    ]
+
+
+def filter_downline(queryset, path, max_depth=None):
+    """Потомки пользователя с путем ``path``: диапазон по индексу путей."""
+    queryset = queryset.filter(path__gt=path)
+    upper = next_prefix(path)
+    if upper is not None:
+        queryset = queryset.filter(path__lt=upper)
+    if max_depth:
+        base_depth = len(path) // REFERRAL_PATH_SEGMENT_WIDTH - 1
+        queryset = queryset.filter(depth__lte=base_depth + max_depth)
+    return queryset
+
+
+def get_downline(user_id, max_depth=None):
+    """Связи всех потомков пользователя до уровня ``max_depth``."""
+    return filter_downline(
+        ReferralRelationship.objects.all(), get_path(user_id), max_depth
+    )
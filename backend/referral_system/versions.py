@@ -0,0 +1,70 @@
+"""Версии списка рефералов для условных HTTP-запросов.
+
+Версия - время последнего изменения связей реферера в микросекундах,
+хранится в кэше. Она обновляется после фиксации транзакции, которая
+создала или удалила связи, поэтому данные, прочитанные после версии,
+не старше ее. Из версии строится ETag, и запрос с актуальным ETag
+получает 304 без обращения к таблицам.
+
+Версии должны быть общими для всех процессов: в кэше одного процесса
+другие процессы не увидят изменений и ответят 304 на устаревшие данные.
+Поэтому версии включает ``REFERRALS_VERSIONS`` (по умолчанию - только с
+Redis), без них ответ отдается без ETag.
+
+Если версии нет в кэше (вытеснена или еще не создавалась), она
+создается заново с текущим временем: ETag меняется, клиенты один раз
+получают полный ответ.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .constants import REFERRALS_VERSION_CACHE_KEY, REFERRALS_VERSION_TIMEOUT
+
+
+def is_enabled():
+    return getattr(settings, 'REFERRALS_VERSIONS', False)
+
+
+def get_version_key(user_id):
+    return REFERRALS_VERSION_CACHE_KEY.format(user_id=user_id)
+
+
+def new_version():
+    return time.time_ns() // 1000
+
+
+def touch(referrer_ids, using=None):
+    """Обновляет версии рефереров после фиксации текущей транзакции."""
+    keys = [get_version_key(user_id) for user_id in set(referrer_ids)]
+    if not keys or not is_enabled():
+        return
+
+    def update():
+        cache.set_many(
+            dict.fromkeys(keys, new_version()),
+            timeout=REFERRALS_VERSION_TIMEOUT
+        )
+
+    transaction.on_commit(update, using=using)
+
+
+async def aget_version(user_id, create=False):
+    """Версия рефералов пользователя; без ``create`` - None при промахе.
+
+    None также при отключенных версиях. Создавать версию нужно до
+    чтения данных, которые она описывает.
+    """
+    if not is_enabled():
+        return None
+    key = get_version_key(user_id)
+    version = await cache.aget(key)
+    if version is None and create:
+        version = new_version()
+        if not await cache.aadd(key, version, REFERRALS_VERSION_TIMEOUT):
+            # Версию только что записал другой запрос
+            version = await cache.aget(key, version)
+    return version
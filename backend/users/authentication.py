@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.models import TokenUser
+
+from backend.cache import LRUCache
+
+
+User = get_user_model()
+
+# Значения полей, а не экземпляры модели: объект не делится между потоками
+_users = LRUCache(settings.USER_CACHE_MAX_ENTRIES)
+
+
+def get_cached_user(user_id):
+    """Пользователь из короткоживущего кэша процесса или из БД.
+
+    Каждый вызов возвращает новый экземпляр ``ApplicationUser``,
+    который можно изменять, не затрагивая другие запросы.
+    """
+    values = _users.get(user_id)
+    if values is None:
+        user = User.objects.get(pk=user_id)
+        _users.set(user_id, {
+            field.attname: getattr(user, field.attname)
+            for field in User._meta.concrete_fields
+        }, settings.USER_CACHE_TIMEOUT)
+        return user
+    return User.from_db(
+        router.db_for_read(User), list(values), list(values.values())
+    )
+
+
+class ClaimsUser(TokenUser):
+    """Пользователь, построенный из claims access-токена без запроса к БД.
+
+    Модель ``ApplicationUser`` загружается лениво через ``instance``
+    только там, где она действительно нужна.
+    """
+
+    @cached_property
+    def email(self):
+        return self.token.get('email', '')
+
+    @cached_property
+    def has_active_code(self):
+        return self.token.get('has_active_code', False)
+
+    @cached_property
+    def instance(self):
+        return get_cached_user(self.id)
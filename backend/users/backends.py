@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from . import hashing
+
+
+User = get_user_model()
+
+
+class HashingPoolModelBackend(ModelBackend):
+    """ModelBackend, проверяющий пароль в пуле процессов хеширования."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.get_by_natural_key(username)
+        except User.DoesNotExist:
+            hashing.check_dummy_password(password)
+            return None
+        if (hashing.check_password(user, password)
+           and self.user_can_authenticate(user)):
+            return user
+        return None
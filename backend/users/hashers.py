@@ -0,0 +1,46 @@
+"""Хешеры паролей с параметрами из ``settings.PASSWORD_HASHER_PARAMS``.
+
+Имена алгоритмов совпадают со стандартными хешерами Django, поэтому
+существующие хеши остаются валидными, а при смене параметров пароль
+перехешируется при следующем входе пользователя.
+"""
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def get_param(name, default):
+    return settings.PASSWORD_HASHER_PARAMS.get(name, default)
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    iterations = get_param(
+        'iterations', hashers.PBKDF2PasswordHasher.iterations
+    )
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    work_factor = get_param(
+        'work_factor', hashers.ScryptPasswordHasher.work_factor
+    )
+    block_size = get_param(
+        'block_size', hashers.ScryptPasswordHasher.block_size
+    )
+    parallelism = get_param(
+        'parallelism', hashers.ScryptPasswordHasher.parallelism
+    )
+    maxmem = get_param('maxmem', hashers.ScryptPasswordHasher.maxmem)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Требует установленного пакета argon2-cffi."""
+
+    time_cost = get_param(
+        'time_cost', hashers.Argon2PasswordHasher.time_cost
+    )
+    memory_cost = get_param(
+        'memory_cost', hashers.Argon2PasswordHasher.memory_cost
+    )
+    parallelism = get_param(
+        'parallelism', hashers.Argon2PasswordHasher.parallelism
+    )
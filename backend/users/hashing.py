@@ -0,0 +1,128 @@
+"""Хеширование паролей в ограниченном пуле процессов.
+
+PBKDF2/scrypt/argon2 нагружают CPU на сотни миллисекунд, поэтому
+хеширование выполняется в отдельных процессах, а поток запроса только
+ждет результат. Число задач в пуле (выполняемых и ожидающих) ограничено
+``PASSWORD_HASHING_MAX_PENDING``: при переполнении интерактивные запросы
+сразу получают ``HashingPoolSaturated`` вместо очереди без конца.
+"""
+
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.crypto import get_random_string
+
+from backend.metrics import record_password_hash
+from backend.process import setup_worker
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = None
+_dummy_password = None
+
+
+class HashingPoolSaturated(Exception):
+    """Пул хеширования паролей переполнен."""
+
+    def __init__(self, retry_after):
+        super().__init__('Пул хеширования паролей переполнен.')
+        self.retry_after = retry_after
+
+
+def verify_password(password, encoded):
+    """Проверяет пароль, возвращает (is_correct, must_update)."""
+    must_update = []
+    is_correct = hashers.check_password(
+        password, encoded, setter=lambda raw_password: must_update.append(1)
+    )
+    return is_correct, bool(must_update)
+
+
+def get_executor():
+    global _executor, _slots
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _slots = threading.BoundedSemaphore(
+                    settings.PASSWORD_HASHING_MAX_PENDING
+                )
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.PASSWORD_HASHING_WORKERS,
+                    initializer=setup_worker
+                )
+    return _executor
+
+
+def submit(fn, *args, block=False):
+    """Ставит задачу в пул, занимая один слот очереди.
+
+    Без ``block`` при отсутствии свободных слотов сразу выбрасывает
+    ``HashingPoolSaturated``.
+    """
+    executor = get_executor()
+    if not _slots.acquire(blocking=block):
+        raise HashingPoolSaturated(settings.PASSWORD_HASHING_RETRY_AFTER)
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda future: _slots.release())
+    return future
+
+
+def wait(futures, operation):
+    """Результаты задач пула с учетом времени ожидания в метриках."""
+    start = time.perf_counter()
+    try:
+        return [future.result() for future in futures]
+    finally:
+        record_password_hash(operation, time.perf_counter() - start)
+
+
+def make_password(password):
+    return wait([submit(hashers.make_password, password)], 'make')[0]
+
+
+def check_password(user, password):
+    """Проверяет пароль пользователя в пуле.
+
+    Если хеш устарел (сменился алгоритм или его параметры), пароль
+    перехешируется и сохраняется, как в ``AbstractBaseUser.check_password``.
+    """
+    [(is_correct, must_update)] = wait(
+        [submit(verify_password, password, user.password)], 'check'
+    )
+    if is_correct and must_update:
+        user.password = make_password(password)
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+def check_dummy_password(password):
+    """Проверка пароля с той же стоимостью, что и для реального пользователя.
+
+    Вызывается, когда пользователь не найден, чтобы время ответа
+    не выдавало существование имени пользователя.
+    """
+    global _dummy_password
+    if _dummy_password is None:
+        _dummy_password = make_password(get_random_string(32))
+    wait([submit(verify_password, password, _dummy_password)], 'check')
+    return False
+
+
+def hash_passwords(passwords):
+    """Хеширует пароли параллельно, сохраняя порядок.
+
+    Для пакетной обработки: ждет освобождения слотов вместо отказа.
+    """
+    futures = [
+        submit(hashers.make_password, password, block=True)
+        for password in passwords
+    ]
+    return wait(futures, 'make_many')
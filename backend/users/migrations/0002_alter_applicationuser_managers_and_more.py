@@ -0,0 +1,36 @@
+# Generated by Django 4.2.16 on 2026-10-17 17:43
+
+from django.db import migrations, models
+import django.db.models.functions.text
+import users.models
+
+from backend.db.operations import AddUniqueConstraintConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнять в транзакции
+    atomic = False
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='applicationuser',
+            managers=[
+                ('objects', users.models.ApplicationUserManager()),
+            ],
+        ),
+        AddUniqueConstraintConcurrently(
+            model_name='applicationuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='users_email_ci_unique', violation_error_message='Пользователь с таким email уже существует.'),
+        ),
+        # Прежний уникальный индекс по email удаляется после создания
+        # индекса по LOWER(email)
+        migrations.AlterField(
+            model_name='applicationuser',
+            name='email',
+            field=models.EmailField(max_length=254, verbose_name='Email'),
+        ),
+    ]
@@ -1,9 +1,30 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
+from django.db.models.functions import Lower
 
 from .constants import MAX_CHARFIELD_LENGTH, MAX_EMAIL_LENGTH
 
 
+class ApplicationUserQuerySet(models.QuerySet):
+
+    def by_email(self, email):
+        """Поиск по email без учета регистра (по индексу LOWER(email))."""
+        return self.alias(email_lower=Lower('email')).filter(
+            email_lower=email.lower()
+        )
+
+    def by_emails(self, emails):
+        return self.alias(email_lower=Lower('email')).filter(
+            email_lower__in=[email.lower() for email in emails]
+        )
+
+
+class ApplicationUserManager(
+    UserManager.from_queryset(ApplicationUserQuerySet)
+):
+    pass
+
+
 class ApplicationUser(AbstractUser):
     """Модель пользователя."""
 
@@ -22,17 +43,26 @@ class ApplicationUser(AbstractUser):
     )
     email = models.EmailField(
         max_length=MAX_EMAIL_LENGTH,
-        unique=True,
-        error_messages={
-            'unique': 'Пользователь с таким email уже существует.'
-        },
         verbose_name='Email',
     )
 
+    objects = ApplicationUserManager()
+
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ('username',)
+        constraints = (
+            # Уникальность email без учета регистра, индекс используется
+            # и для поиска по email
+            models.UniqueConstraint(
+                Lower('email'),
+                name='users_email_ci_unique',
+                violation_error_message=(
+                    'Пользователь с таким email уже существует.'
+                ),
+            ),
+        )
 
     def __str__(self):
         return self.username
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from referral_system.models import ReferralCode
+from users import authentication
+from users.tokens import UserClaimsRefreshToken
+
+
+User = get_user_model()
+
+
+class ClaimsUserTests(TestCase):
+    """Claims токена и ленивая загрузка модели пользователя."""
+
+    def setUp(self):
+        authentication._users.clear()
+        self.addCleanup(authentication._users.clear)
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password'
+        )
+
+    def get_claims_user(self):
+        token = UserClaimsRefreshToken.for_user(
+            User.objects.select_related('referral_code').get(pk=self.user.pk)
+        ).access_token
+        return authentication.ClaimsUser(token)
+
+    def test_has_active_code_claim(self):
+        self.assertFalse(self.get_claims_user().has_active_code)
+        ReferralCode.objects.create(
+            user=self.user, code='code',
+            expiration_date=timezone.now() + timezone.timedelta(days=1)
+        )
+        self.assertTrue(self.get_claims_user().has_active_code)
+
+    def test_instance_from_cache(self):
+        first = self.get_claims_user().instance
+        claims_user = self.get_claims_user()
+        with self.assertNumQueries(0):
+            second = claims_user.instance
+        # Каждый запрос получает свой экземпляр модели
+        self.assertIsNot(first, second)
+        self.assertEqual(second.pk, self.user.pk)
+        self.assertEqual(second.email, 'user@example.com')
+        self.assertFalse(second._state.adding)
+        second.email = 'changed@example.com'
+        self.assertEqual(
+            self.get_claims_user().instance.email, 'user@example.com'
+        )
@@ -0,0 +1,26 @@
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+class UserClaimsRefreshToken(RefreshToken):
+    """Refresh-токен с данными пользователя в claims.
+
+    Claims копируются в access-токен, что позволяет аутентифицировать
+    запросы без загрузки пользователя из БД (см. ``ClaimsUser``).
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token['username'] = user.username
+        token['email'] = user.email
+        token['is_staff'] = user.is_staff
+        token['has_active_code'] = has_active_code(user)
+        return token
+
+
+def has_active_code(user):
+    """Проверка по уже загруженному коду (select_related), без запроса."""
+    try:
+        return not user.referral_code.is_expired()
+    except user._meta.model.referral_code.RelatedObjectDoesNotExist:
+        return False